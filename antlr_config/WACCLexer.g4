@@ -94,8 +94,8 @@ CHAR: SYM_SINGLEQUOTE ASCII SYM_SINGLEQUOTE;
 fragment ASCII: (~('\\'|'\''|'"') | '\\' ESCAPED_CHAR);
 fragment ESCAPED_CHAR: '0'|'b'|'t'|'n'|'f'|'r'|'"'|'\''|'\\';
 
-/* Ignore comments and white space */
-COMMENT_IGNORE: '#' ~'\n'* '\n' -> skip;
+/* Ignore comments and white space, comments are kept on the hidden channel for the IDE highlighter */
+COMMENT: '#' ~'\n'* '\n' -> channel(HIDDEN);
 WS: [ \t\r\n]+ -> channel(HIDDEN);
 
 /* Match anything */
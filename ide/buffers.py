@@ -0,0 +1,141 @@
+''' Tabs of the open files, all shown in the one CodeFrame
+
+Only the active buffer is in Tk, the others keep their text and a snapshot
+of its analysis (tokens, spans of the parse and errors), so switching back
+to a tab paints it without lexing or parsing it again. The snapshots of the
+least recently used tabs are dropped once they take more than
+ANALYSIS_CACHE_LIMIT, those tabs are painted from scratch when shown. '''
+from tkinter import *
+from tkinter import ttk
+import os
+
+ANALYSIS_CACHE_LIMIT = 50 * 1024 * 1024  # bytes
+UNTITLED = "untitled"
+
+
+class Buffer:
+
+    def __init__(self, path, text, reduced_features=False):
+        self.path = path
+        self.text = text
+        self.reduced_features = reduced_features
+        # None while the buffer is shown or once its snapshot was dropped
+        self.analysis = None
+        self.insert = "1.0"
+        self.yview = 0.0
+        self.log = None
+        self.output = None
+
+    def name(self):
+        return UNTITLED if self.path == NONE else os.path.basename(self.path)
+
+
+class BufferTabs(ttk.Notebook):
+    ''' A tab per buffer, the tabs are empty frames and the code is shown in code_frame below them '''
+
+    def __init__(self, parent, code_frame, event_log, woutput, on_switch=None):
+        ttk.Notebook.__init__(self, parent)
+        self.code_frame = code_frame
+        self.event_log = event_log
+        self.woutput = woutput
+        self.on_switch = on_switch
+        self.buffers = []
+        self.tab_frames = []
+        # the least recently shown buffer first, the active one last
+        self.recently_used = []
+        self.active = None
+        self.bind("<<NotebookTabChanged>>", self._on_tab_changed)
+
+    def open(self, path, text, reduced_features=False, on_progress=None, on_done=None):
+        ''' Shows the tab of path, a new one if the file is not open yet '''
+        for buffer in self.buffers:
+            if path != NONE and buffer.path == path:
+                self.show(buffer, on_progress, on_done)
+                return buffer
+        buffer = Buffer(path, text, reduced_features)
+        frame = ttk.Frame(self, height=0)
+        self.buffers.append(buffer)
+        self.tab_frames.append(frame)
+        self.add(frame, text=buffer.name())
+        self.show(buffer, on_progress, on_done)
+        return buffer
+
+    def rename(self, buffer, path):
+        buffer.path = path
+        self.tab(self.tab_frames[self.buffers.index(buffer)], text=buffer.name())
+
+    def close(self, buffer):
+        index = self.buffers.index(buffer)
+        if buffer is self.active:
+            # the text of a closed buffer is not needed any more
+            self.active = None
+            others = [b for b in self.recently_used if b is not buffer]
+            if others:
+                self.show(others[-1])
+            else:
+                self.open(NONE, "")
+        frame = self.tab_frames[index]
+        del self.buffers[index]
+        del self.tab_frames[index]
+        self.recently_used.remove(buffer)
+        self.forget(frame)
+
+    def show(self, buffer, on_progress=None, on_done=None):
+        if buffer is self.active:
+            if on_done is not None:
+                on_done()
+            return
+        if self.active is not None:
+            self._stash(self.active)
+        self.active = buffer
+        if buffer in self.recently_used:
+            self.recently_used.remove(buffer)
+        self.recently_used.append(buffer)
+        self._drop_old_analyses()
+
+        self.select(self.tab_frames[self.buffers.index(buffer)])
+        text = self.code_frame.text
+        text.set_reduced_features(buffer.reduced_features)
+        analysis, buffer.analysis = buffer.analysis, None
+
+        def loaded():
+            text.mark_set('insert', buffer.insert)
+            text.yview_moveto(buffer.yview)
+            if analysis is not None and buffer.log is not None:
+                self.event_log.restore(buffer.log)
+            if on_done is not None:
+                on_done()
+
+        text.load(buffer.text, on_progress=on_progress, on_done=loaded, analysis=analysis)
+        if buffer.output is not None:
+            self.woutput.restore(buffer.output)
+        if self.on_switch is not None:
+            self.on_switch(buffer)
+
+    def _stash(self, buffer):
+        ''' Takes what the tab needs to be shown again from the widgets, before they show another tab '''
+        text = self.code_frame.text
+        buffer.output = self.woutput.snapshot()
+        if text.loading:
+            # the text is not all in yet, the buffer keeps the one it was loaded from
+            return
+        buffer.text = text.get('1.0', 'end - 1c')
+        buffer.insert = text.index('insert')
+        buffer.yview = text.yview()[0]
+        buffer.log = self.event_log.snapshot()
+        buffer.analysis = text.painter.snapshot()
+
+    def _drop_old_analyses(self):
+        size = 0
+        for buffer in reversed(self.recently_used):
+            if buffer.analysis is None:
+                continue
+            if size + buffer.analysis.size() > ANALYSIS_CACHE_LIMIT:
+                buffer.analysis = None
+            else:
+                size += buffer.analysis.size()
+
+    def _on_tab_changed(self, event):
+        # also called by select() in show(), then the buffer is already the active one
+        index = self.index(self.select())
+        self.show(self.buffers[index])
@@ -4,13 +4,17 @@ from tkinter import *
 from tkinter import font as tk_font
 from PIL import ImageTk
 
-import sys
+import time
 
 from style import get_default_font, common_text_style, code_theme
-from painter import Painter
+from painter import Painter, CONTEXT_TAGS, CONTEXT_TAG_PREFIX
+from instrumentation import timings, GUTTER, BULBS
 
 
-ONE_SECOND = 1000  # milliseconds
+MAX_BULBS = 50
+# lines inserted per callback while a file is loaded, the window handles its events in between
+LOAD_CHUNK_LINES = 5000
+LOAD_CHUNK_INTERVAL = 1  # ms
 
 
 class Bulb(tk.Label):
@@ -24,40 +28,61 @@ class Bulb(tk.Label):
     HOVER_LABEL_OFFSET = 36
     PADX_OFFSET = common_text_style['padx']
     PADY_OFFSET = common_text_style['pady']
+    HIDDEN_POSITION = (-200, -200)
 
-    def __init__(self, error, *args, **kwargs):
+    image = None
+
+    @classmethod
+    def get_image(cls):
+        ''' The image is loaded once and shared by all the bulbs '''
+        if cls.image is None:
+            cls.image = PhotoImage(file="broken_heart.png")
+        return cls.image
+
+    def __init__(self, *args, **kwargs):
         tk.Label.__init__(self, *args, **kwargs)
-        self.error = error
+        self.error = None
         self.text = args[0]
-        self.frame_x = 0
-        self.frame_y = 0
+        self.frame_x, self.frame_y = self.HIDDEN_POSITION
 
-        self.image = PhotoImage(file="broken_heart.png")
-        self.configure(image=self.image, bg=common_text_style['background'])
+        self.configure(image=self.get_image(), bg=common_text_style['background'])
+        self.place(x=self.frame_x, y=self.frame_y)
 
         self.hover_label = None
         self.bind("<Enter>", self._hover)
         self.bind("<Leave>", self._hover_leave)
 
+    def show(self, error):
+        ''' Bulbs are reused, so the same widget shows different errors over time '''
+        if error is not self.error:
+            self._hover_leave(None)
+            self.error = error
+        self.redraw()
+
     def redraw(self):
         ''' Change position when user scrolls '''
-        char_pos = self.error.char_pos()
-        character = self.text.get(char_pos)
         try:
-            x, y, width, height = self.text.bbox(char_pos)
+            x, y, width, height = self.text.bbox(self.error.char_pos())
         except TypeError:
             self.hide()
             return
 
         # Coords of char center relative to the top left corner of code text
-        self.frame_x = x + self.PADX_OFFSET - width
-        self.frame_y = y + self.DISTANCE_FROM_CHAR + self.PADY_OFFSET
-        self.place_configure(x=self.frame_x, y=self.frame_y)
+        self._move(x + self.PADX_OFFSET - width, y + self.DISTANCE_FROM_CHAR + self.PADY_OFFSET)
 
     def hide(self):
-        self.place_configure(x=-200, y=-200)
+        self._hover_leave(None)
+        self.error = None
+        self._move(*self.HIDDEN_POSITION)
+
+    def _move(self, frame_x, frame_y):
+        if (frame_x, frame_y) != (self.frame_x, self.frame_y):
+            self.frame_x, self.frame_y = frame_x, frame_y
+            self.place_configure(x=frame_x, y=frame_y)
 
     def _hover(self, event):
+        if self.error is None:
+            return
         self.hover_label = Label(
             self.text, text=self.error.msg, bd=1, relief='sunken',
             anchor='e', justify='left', wraplength=300,
@@ -66,8 +91,9 @@ class Bulb(tk.Label):
         self.hover_label.place(x=self.frame_x + self.HOVER_LABEL_OFFSET, y=self.frame_y)
 
     def _hover_leave(self, event):
-        self.hover_label.destroy()
-        self.hover_label = None
+        if self.hover_label is not None:
+            self.hover_label.destroy()
+            self.hover_label = None
 
 
 class TextLineNumbers(tk.Canvas):
@@ -78,19 +104,33 @@ class TextLineNumbers(tk.Canvas):
         tk.Canvas.__init__(self, *args, **kwargs)
         self.textwidget = None
         self.no_digits = 2
+        self.font = get_default_font()
+        # [canvas item, shown text, y] of every row, reused instead of recreated on each redraw
+        self.rows = []
+        self.last_view = None
         self.adjust_width()
 
     def adjust_width(self):
-        width = 2 * self.H_PADDING + self.no_digits * get_default_font()['size']
+        width = 2 * self.H_PADDING + self.no_digits * self.font['size']
         self.config(width=width)
 
     def attach(self, text_widget):
         self.textwidget = text_widget
 
     def redraw(self, *args):
-        '''redraw line numbers'''
-        self.delete("all")
-        index = self.textwidget.index("@0,0")
+        '''redraw line numbers, if the visible lines changed'''
+        first = self.textwidget.index("@0,0")
+        # Cursor moves and edits inside a line do not move the numbers
+        view = (first, self.textwidget.dlineinfo(first), self.textwidget.index("end"), self.winfo_height())
+        if view == self.last_view:
+            return
+        self.last_view = view
+        with timings.measure(GUTTER):
+            self._redraw_rows(first)
+
+    def _redraw_rows(self, first):
+        row = 0
+        index = first
         while True:
             dline = self.textwidget.dlineinfo(index)
             if dline is None:
@@ -103,10 +143,26 @@ class TextLineNumbers(tk.Canvas):
                 self.no_digits = len(linenum)
                 self.adjust_width()
 
-            self.create_text(self.H_PADDING, y, anchor="nw", justify='left',
-                             text=linenum, font=get_default_font())
+            if row == len(self.rows):
+                item = self.create_text(self.H_PADDING, y, anchor="nw", justify='left',
+                                        text=linenum, font=self.font)
+                self.rows.append([item, linenum, y])
+            else:
+                item, shown_text, shown_y = self.rows[row]
+                if shown_text != linenum:
+                    self.itemconfigure(item, text=linenum)
+                if shown_y != y:
+                    self.coords(item, self.H_PADDING, y)
+                self.rows[row] = [item, linenum, y]
+            row += 1
             index = self.textwidget.index("%s+1line" % index)
 
+        # The rows below the last line are kept empty for later
+        for unused in self.rows[row:]:
+            if unused[1]:
+                self.itemconfigure(unused[0], text="")
+                unused[1] = ""
+
 
 class CodeText(tk.Text):
 
@@ -114,24 +170,39 @@ class CodeText(tk.Text):
         tk.Text.__init__(self, *args, **kwargs)
 
         self.painter = Painter(self)
+        # Bulbs are created up to MAX_BULBS and reused, only the errors on the visible lines get one
         self.bulbs = []
+        self.errors = []
+        self.bulbs_view = None
 
         # create a proxy for the underlying widget
         self._orig = self._w + "_orig"
         self.tk.call("rename", self._w, self._orig)
         self.tk.createcommand(self._w, self._proxy)
 
-        self.text_type_counter = 0
+        # one timer for all the edits, the parse starts once it fires debounce_delay() after the last one
+        self.last_edit = 0
+        self.paint_job = None
+        self.lexical_job = None
+        # while a file is loaded the edits are not highlighted, numbered or reported
+        self.loading = False
+        self.load_job = None
+        # set for large files, which get only the lexical colouring and no bulbs
+        self.reduced_features = False
         self.event_delete('<<Copy>>', '<Control-c>')
         self.bind("<<TextModified>>", self._on_change)
         self.bind('<Control-c>', self._copy_clipboard)
         self.bind("<<CutLineCommand>>", self._cut_current_line)
         self.bind("<<CursorLineUpdate>>", self._highlight_current_line)
+        self.bind("<Control-Button-1>", self._go_to_definition)
 
     def _proxy(self, command, *args):
+        if self.loading:
+            return self.tk.call((self._orig, command) + args)
 
-        # generate an event if something was added or deleted or the cursor position changed
-        if (args[0] in ("insert", "replace", "delete", "scroll", "moveto") or
+        # generate an event if something was added or deleted or the cursor position changed,
+        # args is empty for queries such as a bare xview() or yview()
+        if (args and args[0] in ("insert", "replace", "delete", "scroll", "moveto") or
             args[0:3] == ("mark", "set", "insert") or
             args[0:2] == ("xview", "moveto") or
             args[0:2] == ("xview", "scroll") or
@@ -145,24 +216,115 @@ class CodeText(tk.Text):
             self.event_generate("<<CursorLineUpdate>>")
 
         # Handling copy and cut commands (^C and ^X)
-        if args[0] == 'sel.first' and args[1] == 'sel.last':
+        if args[0:2] == ('sel.first', 'sel.last'):
             if not self.tag_ranges('sel'):
                 if command == 'delete':
                     self.event_generate('<<CutLineCommand>>')
                 return
 
+        if command in ('insert', 'delete', 'replace'):
+            edit = self._edited_lines(command, args)
+
         # let the actual widget perform the requested action
         cmd = (self._orig, command) + args
         result = self.tk.call(cmd)
 
         # Some common updates of a text
         if command in ('insert', 'delete', 'replace'):
+            self.painter.note_edit(*edit)
+            self._schedule_lexical()
             self.event_generate('<<TextModified>>')
             self.event_generate('<<Change>>')
 
+        # Lines scrolled into view are coloured before the rest of the document
+        if (command == 'yview' and args) or command == 'see':
+            self._schedule_lexical()
+
         # return what the actual widget returned
         return result
 
+    def load(self, text, on_progress=None, on_done=None, analysis=None):
+        ''' Replaces the code with text a chunk of lines at a time, so that the window does not freeze
+            Nothing is highlighted or numbered until the last chunk is inserted, then the text is
+            painted from analysis (Painter.snapshot() of the same text) if it is given '''
+        if self.load_job is not None:
+            self.after_cancel(self.load_job)
+        self.clear_error_bulbs()
+        self.loading = True
+        self.configure(state='normal')
+        self.delete('1.0', 'end')
+        self.configure(state='disabled')
+        # a parse of the old text must not be applied to the new one
+        self.painter.reset()
+        lines = text.splitlines(keepends=True)
+        self._load_chunk(lines, 0, on_progress, on_done, analysis)
+
+    def _load_chunk(self, lines, start, on_progress, on_done, analysis):
+        end = start + LOAD_CHUNK_LINES
+        self.configure(state='normal')
+        self.insert('end - 1c', "".join(lines[start:end]))
+        self.configure(state='disabled')
+        if end < len(lines):
+            if on_progress is not None:
+                on_progress(end / len(lines))
+            self.load_job = self.after(LOAD_CHUNK_INTERVAL, self._load_chunk,
+                                       lines, end, on_progress, on_done, analysis)
+            return
+
+        self.load_job = None
+        self.loading = False
+        self.configure(state='normal')
+        self.mark_set('insert', '1.0')
+        self.see('1.0')
+        if analysis is not None:
+            self.painter.restore(analysis)
+        else:
+            self.painter.reset()
+            self._schedule_lexical()
+            self.update_highlight()
+        self.event_generate('<<Change>>')
+        if on_done is not None:
+            on_done()
+
+    def set_reduced_features(self, reduced):
+        ''' Large files are coloured by the lexer alone, without parsing, semantic checks and bulbs '''
+        self.reduced_features = reduced
+        self.painter.lexical_only = reduced
+        if reduced:
+            self.clear_error_bulbs()
+
+    def _line_of(self, index):
+        return int(str(self.tk.call(self._orig, 'index', index)).split('.')[0])
+
+    def _edited_lines(self, command, args):
+        ''' Returns (first line, last line before the edit, last line after the edit) '''
+        # Tk never touches the final newline, so 'end' counts as the last line
+        last_line = self._line_of('end - 1c')
+        first = min(self._line_of(args[0]), last_line)
+        if command == 'insert':
+            old_last = first
+            inserted = args[1::2]
+        else:
+            old_last = min(self._line_of(args[1] if len(args) > 1 else f"{args[0]} + 1c"), last_line)
+            # Tk ignores ranges which end before they start
+            old_last = max(old_last, first)
+            inserted = args[2::2] if command == 'replace' else ()
+        return first, old_last, first + sum(chars.count('\n') for chars in inserted)
+
+    def _schedule_lexical(self):
+        if self.lexical_job is None:
+            self.lexical_job = self.after_idle(self._paint_lexical)
+
+    def _paint_lexical(self):
+        self.lexical_job = None
+        self.painter.paint_lexical()
+
+    def visible_lines(self):
+        ''' Returns the first and the last line in the viewport '''
+        first = self.index("@0,0")
+        last = self.index(f"@0,{self.winfo_height()}")
+        return int(first.split('.')[0]), int(last.split('.')[0])
+
     def configure_style(self):
         self.configure(**common_text_style)
 
@@ -186,35 +348,82 @@ class CodeText(tk.Text):
         self.tag_configure("int", foreground=code_theme['int_literal'])
         self.tag_configure("error", background=code_theme['error'], foreground='#ffffff')
         self.tag_configure("function", foreground=code_theme['function'])
+        for tag in CONTEXT_TAGS:
+            self.tag_configure(CONTEXT_TAG_PREFIX + tag, foreground=self.tag_cget(tag, 'foreground'))
+        self.tag_raise("error")
 
     def update_highlight(self):
         self.painter.paint()
 
     def clear_error_bulbs(self):
-        for bulb in self.bulbs:
-            bulb.destroy()
-        self.bulbs = []
-
-    def add_error_bulb(self, error):
-        bulb = Bulb(error, self)
-        bulb.place(x=0, y=0)
-        bulb.redraw()
-        self.bulbs.append(bulb)
-
-    def handle_events(self, triggerer_count):
-        ''' Calls syntax painting only if user didn't edit text for more than one second '''
-        if triggerer_count != self.text_type_counter:
+        if self.errors:
+            self.show_error_bulbs([])
+
+    def show_error_bulbs(self, errors):
+        if self.reduced_features:
+            errors = []
+        self.errors = errors
+        self.bulbs_view = None
+        self.redraw_bulbs()
+
+    def redraw_bulbs(self):
+        ''' Places the pooled bulbs next to the visible errors, if the viewport moved since the last time '''
+        view = (self.index("@0,0"), self.dlineinfo("@0,0"), self.xview(), self.winfo_height())
+        if view == self.bulbs_view:
+            return
+        self.bulbs_view = view
+        with timings.measure(BULBS):
+            self._place_bulbs()
+
+    def _place_bulbs(self):
+        first, last = self.visible_lines()
+        visible_errors = [er for er in self.errors if first <= er.line <= last][:MAX_BULBS]
+        while len(self.bulbs) < len(visible_errors):
+            self.bulbs.append(Bulb(self))
+        for bulb, error in zip(self.bulbs, visible_errors):
+            bulb.show(error)
+        for bulb in self.bulbs[len(visible_errors):]:
+            if bulb.error is not None:
+                bulb.hide()
+
+    def _paint_after_edits(self):
+        ''' Calls syntax painting only if user didn't edit text for debounce_delay() '''
+        # the timer is not moved on every keystroke, it is pushed back when it fires too early
+        remaining = self.painter.debounce_delay() - (time.monotonic() - self.last_edit) * 1000
+        if remaining > 0:
+            self.paint_job = self.after(int(remaining) + 1, self._paint_after_edits)
             return
+        self.paint_job = None
         self.update_highlight()
 
     def _on_change(self, event):
         self.clear_error_bulbs()
 
-        self.text_type_counter += 1
-        self.after(ONE_SECOND, self.handle_events, self.text_type_counter)
+        self.last_edit = time.monotonic()
+        if self.paint_job is None:
+            self.paint_job = self.after(self.painter.debounce_delay(), self._paint_after_edits)
 
-        if (self.text_type_counter >= sys.maxsize):
-            self.text_type_counter = 0
+    def go_to(self, symbol):
+        ''' Moves the cursor to the declaration of symbol, which may have moved since it was parsed '''
+        position = self.painter.symbol_mark(symbol)
+        try:
+            self.index(position)
+        except TclError:
+            position = symbol.char_pos()
+        self.go_to_position(position)
+
+    def go_to_position(self, position):
+        self.mark_set('insert', position)
+        self.see(position)
+        self.focus_set()
+
+    def _go_to_definition(self, event):
+        line, column = map(int, self.index(f"@{event.x},{event.y}").split('.'))
+        symbol = self.painter.symbols.definition_at(line, column)
+        if symbol is None:
+            return
+        self.go_to(symbol)
+        return 'break'
 
     def _highlight_current_line(self, event):
         self.tag_remove("current_line", '1.0', "end")
@@ -268,8 +477,12 @@ class CodeFrame(ttk.Frame):
 
     def link_event_log(self, event_log):
         self.text.painter.attach_event_log(event_log)
+        event_log.on_select = lambda er: self.text.go_to_position(er.char_pos())
+
+    def link_outline(self, outline):
+        self.text.painter.attach_outline(outline)
+        self.text.bind("<Control-p>", outline.focus_finder)
 
     def _on_change(self, event):
         self.linenumbers.redraw()
-        for bulb in self.text.bulbs:
-            bulb.redraw()
+        self.text.redraw_bulbs()
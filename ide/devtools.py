@@ -1,10 +1,40 @@
 from tkinter import *
 from tkinter import ttk
 from tkinter import font as tk_font
-from style import devtool_box_style, common_text_style, get_smaller_font
+from tkinter.filedialog import asksaveasfilename
+from style import devtool_box_style, common_text_style, get_smaller_font, code_theme
+from instrumentation import timings, PHASES
 import subprocess
+import codecs
 import os
+import queue
+import sys
 import threading
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+WACC_TEST_DIR = os.path.join(ROOT_DIR, 'wacc_test')
+sys.path.append(WACC_TEST_DIR)
+from emulationcache import EmulationCache
+
+QEMU_COMMAND = ["qemu-arm", "-L", "/usr/arm-linux-gnueabi/"]
+DEFAULT_RUN_TIMEOUT = 10  # seconds
+RUN_POLL_INTERVAL = 50  # ms
+READ_CHUNK_SIZE = 4096
+# older output is dropped from the widget, so programs printing in a loop do not slow it down
+OUTPUT_LIMIT = 1000000  # characters
+
+# kinds of the messages sent by the run workers to the main thread
+OUTPUT = "output"
+STATUS = "status"
+ASSEMBLED = "assembled"
+FINISHED = "finished"
+
+TIMINGS_REFRESH_INTERVAL = 1000  # ms
+
+STDERR_TAG = "stderr"
+STDIN_TAG = "stdin"
+END_OF_INPUT = None
 
 
 class WOutput(ttk.Frame):
@@ -14,13 +44,36 @@ class WOutput(ttk.Frame):
         ttk.Frame.__init__(self, *args, **kwargs)
 
         self.run_proc = None
+        self.run_id = 0
+        # held while run_id is compared with or changed together with run_proc, by cancel() and the workers
+        self.run_lock = threading.Lock()
+        self.running = False
+        self.messages = queue.Queue()
+        self.poll_job = None
+        # lines typed by the user, written to the program by a worker thread
+        self.stdin_lines = queue.Queue()
+        # (run id, text, tag) chunks read from the program, inserted into the widget once per poll
+        self.pending_output = []
+        self.pending_lock = threading.Lock()
+        self.deadline = 0
 
-        self.label_in = Label(self, text="Program Input")
+        self.toolbar = Frame(self)
+        self.toolbar.pack(side="top", fill="x")
+        self.status = Label(self.toolbar, text="Idle", anchor='w')
+        self.status.pack(side="left", fill="x", expand=True)
+        self.cancel_button = Button(self.toolbar, text="Cancel", command=self.cancel, state='disabled')
+        self.cancel_button.pack(side="right")
+        self.timeout = StringVar(self, value=str(DEFAULT_RUN_TIMEOUT))
+        self.timeout_box = Spinbox(self.toolbar, from_=1, to=3600, width=5, textvariable=self.timeout)
+        self.timeout_box.pack(side="right")
+        self.timeout_label = Label(self.toolbar, text="Timeout (s)")
+        self.timeout_label.pack(side="right")
+
+        self.label_in = Label(self, text="Program Input (Enter sends a line, Ctrl+D ends the input)")
         self.label_in.pack(side="top", fill="x")
 
         self.entry = Entry(self)
         self.entry.pack(side='top', fill='x', anchor='s')
-        self.entry.insert(0, "Coming soon :)")
         self.entry.configure(state="disabled")
 
         self.label_out = Label(self, text="Program Output")
@@ -38,82 +91,326 @@ class WOutput(ttk.Frame):
         tab = tk_font.Font(font=self.text['font']).measure('  ')
         self.text.config(tabs=tab)
         self.text['font'] = get_smaller_font()
+        self.text.tag_configure(STDERR_TAG, foreground=code_theme['error'])
+        self.text.tag_configure(STDIN_TAG, foreground=code_theme['string_literal'])
 
         self.scrollbar_v.pack(side="right", fill="y")
         self.text.pack(side="top", fill="both", expand=True)
 
         self.entry.bind('<Return>', self._submit)
+        self.entry.bind('<Control-d>', self._end_input)
 
     def _submit(self, event):
-        if not self.run_proc:
+        ''' Sends the typed line to the running program '''
+        if self.entry['state'] == 'disabled':
             return
-        stdout_data = self.run_proc.stdin.write(self.entry.get().encode('utf-8'))
+        line = self.entry.get() + "\n"
         self.entry.delete(0, END)
-        self.write(self.run_proc.stdout.read().decode('utf-8'))
+        self.write(line, STDIN_TAG)
+        # a program waiting for input is not killed by the timeout
+        self.deadline = time.monotonic() + self.get_timeout()
+        self.stdin_lines.put(line)
+
+    def _end_input(self, event):
+        if self.entry['state'] == 'disabled':
+            return
+        self.stdin_lines.put(END_OF_INPUT)
+        self.entry.configure(state='disabled')
+        return 'break'
 
     def run(self, compile_command, target_dir, file_name):
+        self.cancel()
         self.text.configure(state='normal')
         self.text.delete('1.0', 'end')
         self.text.configure(state='disabled')
-        if self.run_proc:
-            self.run_proc.kill()
         if file_name == NONE:
             self.write("Please save the file before running it")
             return
 
-        prevDir = os.getcwd()
-        os.chdir('..')
-        proc = subprocess.run([compile_command, '-p', file_name], text=True, capture_output=True)
+        # messages of the previous runs are recognised by their id and dropped
+        with self.run_lock:
+            self.run_id += 1
+        self._set_running(True, "Compiling...")
+        threading.Thread(target=self._build, daemon=True,
+                         args=(self.run_id, compile_command, target_dir, file_name, self.get_timeout())).start()
+        if self.poll_job is None:
+            self._poll()
+
+    def cancel(self):
+        ''' Kills the compiler or the program of the current run '''
+        if not self.running:
+            return
+        with self.run_lock:
+            self.run_id += 1
+            proc = self.run_proc
+        if proc:
+            proc.kill()
+        self._set_running(False, "Cancelled")
+
+    def get_timeout(self):
+        try:
+            return max(1, int(self.timeout.get()))
+        except (TclError, ValueError):
+            return DEFAULT_RUN_TIMEOUT
+
+    def _set_running(self, running, status):
+        self.running = running
+        if not running:
+            with self.run_lock:
+                self.run_proc = None
+            self.stdin_lines.put(END_OF_INPUT)
+            self.entry.configure(state='disabled')
+        self.status.configure(text=status)
+        self.cancel_button.configure(state='normal' if running else 'disabled')
+
+    def _start_process(self, run_id, command, **kwargs):
+        proc = subprocess.Popen(command, **kwargs)
+        with self.run_lock:
+            current = run_id == self.run_id
+            # a process of a cancelled run must not replace the one cancel() has to kill
+            if current:
+                self.run_proc = proc
+        if not current:
+            # the run was cancelled before the process was visible to cancel()
+            proc.kill()
+        return proc
+
+    def _post(self, run_id, kind, payload=None):
+        ''' Called from the worker threads, Tk may only be touched by the main thread '''
+        self.messages.put((run_id, kind, payload))
+
+    def _poll(self):
+        self._flush_output()
+        while True:
+            try:
+                run_id, kind, payload = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if run_id != self.run_id:
+                continue
+            if kind == OUTPUT:
+                self.write(payload)
+            elif kind == STATUS:
+                self.status.configure(text=payload)
+            elif kind == ASSEMBLED:
+                self._start_program(run_id, payload)
+            elif kind == FINISHED:
+                # the readers are done before FINISHED is posted, take the rest of the output
+                self._flush_output()
+                self._set_running(False, payload)
+        self.poll_job = self.after(RUN_POLL_INTERVAL, self._poll) if self.running else None
+
+    def _flush_output(self):
+        ''' Inserts everything the readers collected since the last poll, one insert per tag '''
+        with self.pending_lock:
+            chunks, self.pending_output = self.pending_output, []
+        if not chunks:
+            return
+        batches = []
+        for run_id, text, tag in chunks:
+            if run_id != self.run_id:
+                continue
+            if batches and batches[-1][1] == tag:
+                batches[-1][0].append(text)
+            else:
+                batches.append(([text], tag))
+        if not batches:
+            # all of a stale run, the output stays read only
+            return
+        self.text.configure(state='normal')
+        for texts, tag in batches:
+            self.text.insert('end', "".join(texts), tag)
+        self.text.delete('1.0', f'end - {OUTPUT_LIMIT} chars')
+        self.text.configure(state='disabled')
+        self.text.see('end')
+
+    def _build(self, run_id, compile_command, target_dir, file_name, timeout):
+        ''' Compiles and assembles the program on a worker thread '''
+        proc = self._start_process(run_id, [compile_command, '-p', file_name], cwd=ROOT_DIR, text=True,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        try:
+            assembly, _ = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            self._post(run_id, FINISHED, f"Compilation timed out after {timeout}s")
+            return
+        if run_id != self.run_id:
+            return
         if proc.returncode != 0:
-            self.write(proc.stdout)
-            os.chdir(prevDir)
+            self._post(run_id, OUTPUT, assembly)
+            self._post(run_id, FINISHED, f"Compilation failed with exit code {proc.returncode}")
             return
-        os.chdir(prevDir)
 
         output_assembly = os.path.join(target_dir, 'out.s')
-        output_binary = os.path.join(target_dir, 'out')
-
         with open(output_assembly, 'w') as f:
-            f.write(proc.stdout)
-
-        subprocess.run(f"arm-linux-gnueabi-gcc -o {output_binary} " +\
-            f"-mcpu=arm1176jzf-s -mtune=arm1176jzf-s {output_assembly}", shell=True)
-
-        self.provide_stdin(output_binary)
-
-    def provide_stdin(self, output_binary):
-        ''' Create window and ask User to provide stdin for the program '''
-
-        def submit_stdin():
-            self.run_proc = subprocess.Popen(
-                ["qemu-arm", "-L", "/usr/arm-linux-gnueabi/", output_binary],
-                stdout=subprocess.PIPE,
-                stdin=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
-            submission = text.get('1.0', 'end').encode('utf-8')
-            res, _ = self.run_proc.communicate(input=submission)
-            self.write(res.decode('utf-8'))
-            self.run_proc = None
-            win.destroy()
-            win.update()
-
-        win = Toplevel(self.master)
-        win.title("Please, Provide Standart Input")
-        win.geometry("300x300")
-
-        text = Text(win)
-        # Text style
-        text.configure(**common_text_style)
-        tab = tk_font.Font(font=self.text['font']).measure('  ')
-        text.config(tabs=tab)
-        text['font'] = get_smaller_font()
+            f.write(assembly)
+
+        self._post(run_id, STATUS, "Assembling...")
+        # unchanged programs are not assembled again
+        emulation_cache = EmulationCache()
+        output_binary = emulation_cache.assemble(output_assembly)
+        emulation_cache.close()
+        if output_binary is None:
+            self._post(run_id, FINISHED, "The assembler rejected the generated code")
+            return
+        self._post(run_id, ASSEMBLED, output_binary)
+
+    def _start_program(self, run_id, output_binary):
+        self.stdin_lines = queue.Queue()
+        self.deadline = time.monotonic() + self.get_timeout()
+        self.status.configure(text="Running...")
+        self.entry.configure(state='normal')
+        self.entry.focus_set()
+        threading.Thread(target=self._emulate, daemon=True,
+                         args=(run_id, output_binary, self.stdin_lines, self.get_timeout())).start()
+
+    def _emulate(self, run_id, output_binary, stdin_lines, timeout):
+        ''' Runs the program on a worker thread, its input and output are streamed by helper threads '''
+        proc = self._start_process(run_id, QEMU_COMMAND + [output_binary.path], stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        readers = [threading.Thread(target=self._read_stream, args=(run_id, proc.stdout, None), daemon=True),
+                   threading.Thread(target=self._read_stream, args=(run_id, proc.stderr, STDERR_TAG), daemon=True)]
+        for reader in readers:
+            reader.start()
+        threading.Thread(target=self._write_stdin, args=(proc.stdin, stdin_lines), daemon=True).start()
+
+        # the deadline moves whenever the user sends a line
+        timed_out = False
+        while True:
+            try:
+                exit_code = proc.wait(timeout=max(0, self.deadline - time.monotonic()))
+                break
+            except subprocess.TimeoutExpired:
+                if time.monotonic() >= self.deadline:
+                    timed_out = True
+                    proc.kill()
+        for reader in readers:
+            reader.join()
+
+        if timed_out:
+            self._post(run_id, FINISHED, f"Killed after {timeout}s without any input")
+        else:
+            self._post(run_id, FINISHED, f"Exited with code {exit_code}")
+
+    def _read_stream(self, run_id, stream, tag):
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while True:
+            chunk = os.read(stream.fileno(), READ_CHUNK_SIZE)
+            text = decoder.decode(chunk, final=not chunk)
+            if text:
+                with self.pending_lock:
+                    self.pending_output.append((run_id, text, tag))
+            if not chunk:
+                break
+        stream.close()
 
-        button = Button(win, text="Submit", command=submit_stdin)
-        button.pack(side="top", fill="x")
-        text.pack(side="top", fill="x", expand=True)
+    def _write_stdin(self, stream, stdin_lines):
+        while True:
+            line = stdin_lines.get()
+            if line is END_OF_INPUT:
+                break
+            try:
+                stream.write(line.encode('utf-8'))
+                stream.flush()
+            except (BrokenPipeError, ValueError):
+                break
+        try:
+            stream.close()
+        except BrokenPipeError:
+            pass
 
-    def write(self, text):
+    def write(self, text, tag=None):
         self.text.configure(state='normal')
-        self.text.insert('end', text)
+        self.text.insert('end', text, tag)
         self.text.configure(state='disabled')
+
+    def snapshot(self):
+        ''' Returns the output and the status of the last run, kept by the tab of the file it ran '''
+        return self.text.get('1.0', 'end - 1c'), self.status.cget('text')
+
+    def restore(self, snapshot):
+        ''' Shows the last run of the file of another tab, unless a run is still going on '''
+        if self.running:
+            return
+        output, status = snapshot
+        self.text.configure(state='normal')
+        self.text.delete('1.0', 'end')
+        self.text.insert('1.0', output)
+        self.text.configure(state='disabled')
+        self.status.configure(text=status)
+
+
+class WTimings(ttk.Frame):
+    ''' Shows the timings of the hot paths of the IDE collected by instrumentation.timings '''
+
+    def __init__(self, *args, **kwargs):
+        kwargs['style'] = "CodeFrame.TFrame"
+        ttk.Frame.__init__(self, *args, **kwargs)
+
+        self.shown_count = None
+        self.profile_report = ""
+
+        self.toolbar = Frame(self)
+        self.toolbar.pack(side="top", fill="x")
+        self.label = Label(self.toolbar, text="Timings (ms)", anchor='w')
+        self.label.pack(side="left", fill="x", expand=True)
+        self.export_button = Button(self.toolbar, text="Export JSON", command=self.export)
+        self.export_button.pack(side="right")
+        self.profile_button = Button(self.toolbar, text="Start cProfile", command=self.toggle_profile)
+        self.profile_button.pack(side="right")
+        self.clear_button = Button(self.toolbar, text="Clear", command=self.clear)
+        self.clear_button.pack(side="right")
+
+        self.text = Text(self, wrap=NONE)
+        self.scrollbar_v = Scrollbar(self, orient=VERTICAL, command=self.text.yview)
+        self.text.configure(yscrollcommand=self.scrollbar_v.set)
+        self.text.configure(**common_text_style)
+        self.text['font'] = get_smaller_font()
+        self.text.configure(state='disabled')
+
+        self.scrollbar_v.pack(side="right", fill="y")
+        self.text.pack(side="top", fill="both", expand=True)
+
+        self._refresh()
+
+    def _refresh(self):
+        # the text is only rebuilt if something was measured since the last refresh
+        if timings.count != self.shown_count:
+            self.shown_count = timings.count
+            self.show()
+        self.after(TIMINGS_REFRESH_INTERVAL, self._refresh)
+
+    def show(self):
+        summary = timings.summary()
+        lines = [f"{'phase':10}{'count':>8}{'last':>10}{'median':>10}{'p95':>10}{'max':>10}{'total':>12}"]
+        for phase in PHASES:
+            if phase in summary:
+                stats = summary[phase]
+                lines.append(f"{phase:10}{stats['count']:>8}{stats['last']:>10.2f}{stats['median']:>10.2f}"
+                             f"{stats['p95']:>10.2f}{stats['max']:>10.2f}{stats['total']:>12.1f}")
+        report = "\n".join(lines)
+        if self.profile_report:
+            report += "\n\n" + self.profile_report
+        self.text.configure(state='normal')
+        self.text.delete('1.0', 'end')
+        self.text.insert('1.0', report)
+        self.text.configure(state='disabled')
+
+    def export(self):
+        path = asksaveasfilename(defaultextension='.json', filetypes=[("JSON", "*.json")])
+        if path:
+            timings.export_json(path)
+
+    def toggle_profile(self):
+        if timings.is_profiling():
+            self.profile_report = timings.stop_profile()
+            self.profile_button.configure(text="Start cProfile")
+            self.show()
+        else:
+            timings.start_profile()
+            self.profile_button.configure(text="Stop cProfile")
+
+    def clear(self):
+        timings.clear()
+        self.profile_report = ""
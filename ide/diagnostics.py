@@ -0,0 +1,152 @@
+''' Checks the semantics of the edited code with the compiler daemon
+
+The compiler is the only one which knows the semantic errors, starting a JVM
+for every check would take seconds, so the snapshots of the code are sent to
+the daemon of the compile script, started on the first check if it is not
+running. The daemon stops after the semantic analysis, without generating
+any code. '''
+import atexit
+import os
+import queue
+import re
+import socket
+import subprocess
+import tempfile
+import threading
+
+from eventlog import ErrorData
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+COMPILE_SCRIPT = os.path.join(ROOT_DIR, 'compile')
+COMPILER_JAR = os.path.join(ROOT_DIR, 'target', 'WACC_06-1.0-SNAPSHOT-jar-with-dependencies.jar')
+DAEMON_SOCKET = os.path.join(ROOT_DIR, 'target', 'wacc_daemon.sock')
+CHECK_COMMAND = "check"
+SUCCESS_EXIT_CODE = 0
+SYNTAX_ERROR_EXIT_CODE = 100
+SEMANTIC_ERROR_EXIT_CODE = 200
+DAEMON_START_TIMEOUT = 60  # seconds, the compile script gives up after 30
+
+SEMANTIC_ERROR_HEADER = re.compile(r"-+< SEMANTIC ERROR! >-+\n")
+# "Error at [3: 10]:" if the line of the error is known, "at 3: 10" otherwise
+ERROR_POSITION = re.compile(r"^(?:Error )?at \[?(\d+): (\d+)\]?:?$", re.MULTILINE)
+
+
+def parse_semantic_errors(output):
+    ''' Turns the messages printed by the compiler into ErrorData '''
+    errors = []
+    for message in SEMANTIC_ERROR_HEADER.split(output)[1:]:
+        position = ERROR_POSITION.search(message)
+        if position is None:
+            errors.append(ErrorData(1, 0, message.strip()))
+            continue
+        body = " ".join(line.strip() for line in message[:position.start()].splitlines() if line.strip())
+        errors.append(ErrorData(int(position.group(1)), int(position.group(2)), body))
+    if not errors:
+        # a few checks of the compiler fail without printing where
+        errors.append(ErrorData(1, 0, output.strip() or "Semantic error"))
+    return errors
+
+
+def ask_daemon(request):
+    ''' Returns the exit code and the output of the daemon, None if it is not running, older than the jar
+        or died before answering in full '''
+    try:
+        if os.path.getmtime(DAEMON_SOCKET) < os.path.getmtime(COMPILER_JAR):
+            return None
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(DAEMON_SOCKET)
+            client.sendall(f"{request}\n".encode('utf-8'))
+            response = b""
+            while chunk := client.recv(65536):
+                response += chunk
+    except OSError:
+        return None
+    try:
+        exit_code, output = response.decode('utf-8').split("\n", 1)
+        return int(exit_code), output
+    except ValueError:
+        return None
+
+
+class DiagnosticsClient:
+    ''' Sends the snapshots of the code to the daemon from a thread, the socket does not hold the GIL
+
+        Only the newest snapshot waits to be checked, the older ones are
+        dropped, and the result of a check is dropped as well if a newer
+        snapshot arrived while it was running. '''
+
+    def __init__(self):
+        self.results = queue.Queue()
+        self.latest = []
+        self.arrived = threading.Condition()
+        self.thread = None
+        # set once the daemon failed to start, e.g. without the compiler jar
+        self.unavailable = False
+        fd, self.snapshot_path = tempfile.mkstemp(prefix="wacc_ide_", suffix=".wacc")
+        os.close(fd)
+        atexit.register(self.stop)
+
+    def request(self, version, text):
+        if self.unavailable:
+            return
+        with self.arrived:
+            self.latest[:] = [(version, text)]
+            self.arrived.notify()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._serve, daemon=True)
+            self.thread.start()
+
+    def latest_result(self):
+        ''' Returns the newest (version, errors) received or None, errors is None if the check failed '''
+        result = None
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                return result
+
+    def _serve(self):
+        while True:
+            with self.arrived:
+                while not self.latest:
+                    self.arrived.wait()
+                version, text = self.latest.pop()
+            try:
+                errors = self._check(text)
+            except Exception:
+                # the thread must keep serving, and the painter stops waiting once it gets a result
+                errors = None
+            if self.latest:
+                # a newer snapshot is already waiting, this result would be stale on arrival
+                continue
+            self.results.put((version, errors))
+
+    def _check(self, text):
+        # the compiler reads the lines of the errors from the file
+        with open(self.snapshot_path, 'w') as f:
+            f.write(text)
+        response = ask_daemon(f"{CHECK_COMMAND}\t{self.snapshot_path}")
+        if response is None and self._start_daemon():
+            response = ask_daemon(f"{CHECK_COMMAND}\t{self.snapshot_path}")
+        if response is None:
+            return None
+        exit_code, output = response
+        if exit_code == SEMANTIC_ERROR_EXIT_CODE:
+            return parse_semantic_errors(output)
+        # the syntax errors are reported by the parser of the IDE
+        return [] if exit_code in (SUCCESS_EXIT_CODE, SYNTAX_ERROR_EXIT_CODE) else None
+
+    def _start_daemon(self):
+        try:
+            started = subprocess.run([COMPILE_SCRIPT, '--daemon'], cwd=ROOT_DIR, capture_output=True,
+                                     timeout=DAEMON_START_TIMEOUT).returncode == 0
+        except (OSError, subprocess.TimeoutExpired):
+            started = False
+        self.unavailable = not started
+        return started
+
+    def stop(self):
+        try:
+            os.remove(self.snapshot_path)
+        except OSError:
+            pass
@@ -1,6 +1,7 @@
 from tkinter import *
 from tkinter import ttk
 from tkinter import font as tk_font
+import difflib
 from antlr4.error.ErrorListener import ErrorListener
 from style import get_smaller_font, common_text_style
 
@@ -25,13 +26,49 @@ class SyntaxErrorListener(ErrorListener):
             self.errors.append(ErrorData(line, charPositionInLine, msg))
 
 
+# a syntax error at most this many lines below the previous one is shown as a part of its cascade
+CASCADE_LINES = 2
+# entries shown at once, clicking the last line shows as many more
+MAX_LOG_ENTRIES = 100
+ENTRY_TAG = "entry"
+MORE_TAG = "more"
+
+
+def error_key(er):
+    return er.line, er.charPositionInLine, er.msg
+
+
+def group_cascades(errors):
+    ''' Returns the syntax errors ordered by position in a list per cascade '''
+    groups = []
+    for er in sorted(errors, key=error_key):
+        if groups and er.line - groups[-1][-1].line <= CASCADE_LINES:
+            groups[-1].append(er)
+        else:
+            groups.append([er])
+    return groups
+
+
 class EventLog(ttk.Frame):
     NO_SYNTAX_ERRORS_MSG = "No Syntax Errors have been detected."
+    NO_ERRORS_MSG = "No Syntax or Semantic Errors have been detected."
+    LEXICAL_ONLY_MSG = "The file is too large to be checked, only the lexical colouring is shown."
 
     def __init__(self, *args, **kwargs):
         kwargs['style'] = "CodeFrame.TFrame"
         ttk.Frame.__init__(self, *args, **kwargs)
 
+        # (text, error, tag) of every line shown, the error is None for the lines which are not errors
+        self.entries = []
+        self.errors = []
+        self.semantics_checked = False
+        self.message = None
+        self.limit = MAX_LOG_ENTRIES
+        # keys of the first errors of the cascades shown in full
+        self.expanded = set()
+        # called with the ErrorData of a clicked entry
+        self.on_select = None
+
         self.label = Label(self, text="Event Log")
         self.label.pack(side="top", fill="x")
 
@@ -46,19 +83,104 @@ class EventLog(ttk.Frame):
         tab = tk_font.Font(font=self.text['font']).measure('  ')
         self.text.config(tabs=tab)
         self.text['font'] = get_smaller_font()
+        # the entries used to be separated by an empty line
+        self.text.tag_configure(ENTRY_TAG, spacing3=get_smaller_font().metrics('linespace'))
+        self.text.tag_configure(MORE_TAG, underline=True)
+        self.text.tag_bind(ENTRY_TAG, '<Button-1>', self._select)
+        self.text.tag_bind(ENTRY_TAG, '<Double-Button-1>', self._expand)
+        self.text.tag_bind(MORE_TAG, '<Button-1>', self._show_more)
 
         self.scrollbar_v.pack(side="right", fill="y")
         self.text.pack(side="top", fill="both", expand=True)
 
-    def log(self, errors):
-        if not errors:
-            summary = self.NO_SYNTAX_ERRORS_MSG
+    def log(self, errors, semantics_checked=False):
+        if errors is self.errors and semantics_checked == self.semantics_checked and self.message is None:
+            # painted again without a new parse
+            return
+        self.errors = errors
+        self.semantics_checked = semantics_checked
+        self.message = None
+        self._render(self._entries())
+
+    def show(self, summary):
+        self.message = summary
+        self.limit = MAX_LOG_ENTRIES
+        self.expanded = set()
+        self._render([(summary, None, ())])
+
+    def snapshot(self):
+        return self.errors, self.semantics_checked, self.message
+
+    def restore(self, snapshot):
+        errors, semantics_checked, message = snapshot
+        if message is not None:
+            self.show(message)
         else:
-            summary = ""
-            for er in errors:
-                summary += f"- Line {er.line}:{er.charPositionInLine} {er.msg}\n\n"
-
+            self.log(errors, semantics_checked)
+
+    def _entries(self):
+        if not self.errors:
+            return [(self.NO_ERRORS_MSG if self.semantics_checked else self.NO_SYNTAX_ERRORS_MSG, None, ())]
+        if self.semantics_checked:
+            # the semantic errors are independent of each other, only the recovery of the parser cascades
+            groups = [[er] for er in sorted(self.errors, key=error_key)]
+        else:
+            groups = group_cascades(self.errors)
+        entries = []
+        for group in groups[:self.limit]:
+            first = group[0]
+            if len(group) == 1 or error_key(first) in self.expanded:
+                entries += [(self._describe(er), er, ENTRY_TAG) for er in group]
+            else:
+                entries.append((f"{self._describe(first)} (and {len(group) - 1} more up to line "
+                                f"{group[-1].line}, double-click to show them)", first, ENTRY_TAG))
+        if len(groups) > self.limit:
+            hidden = sum(len(group) for group in groups[self.limit:])
+            entries.append((f"{hidden} more errors after line {groups[self.limit - 1][-1].line}", None, MORE_TAG))
+        return entries
+
+    @staticmethod
+    def _describe(er):
+        return f"- Line {er.line}:{er.charPositionInLine} {er.msg}"
+
+    def _render(self, entries):
+        ''' Inserts and deletes only the lines which differ from the shown ones '''
+        old_lines = [summary for summary, _, _ in self.entries]
+        new_lines = [summary for summary, _, _ in entries]
         self.text.configure(state='normal')
-        self.text.delete('1.0', 'end')
-        self.text.insert('1.0', summary)
+        if not self.entries:
+            # the text put in before the first entries
+            self.text.delete('1.0', 'end')
+        opcodes = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes()
+        # from the end, so that the line numbers of the earlier changes stay valid
+        for operation, old_start, old_end, new_start, new_end in reversed(opcodes):
+            if operation == 'equal':
+                continue
+            if old_end > old_start:
+                self.text.delete(f"{old_start + 1}.0", f"{old_end + 1}.0")
+            if new_end > new_start:
+                chunks = []
+                for summary, _, tag in entries[new_start:new_end]:
+                    chunks += [summary + "\n", tag]
+                self.text.insert(f"{old_start + 1}.0", *chunks)
         self.text.configure(state='disabled')
+        self.entries = entries
+
+    def _entry_at(self, event):
+        line = int(self.text.index(f"@{event.x},{event.y}").split('.')[0])
+        return self.entries[line - 1] if line <= len(self.entries) else (None, None, ())
+
+    def _select(self, event):
+        _, er, _ = self._entry_at(event)
+        if er is not None and self.on_select is not None:
+            self.on_select(er)
+
+    def _expand(self, event):
+        _, er, _ = self._entry_at(event)
+        if er is not None and error_key(er) not in self.expanded:
+            self.expanded.add(error_key(er))
+            self._render(self._entries())
+
+    def _show_more(self, event):
+        self.limit += MAX_LOG_ENTRIES
+        self._render(self._entries())
@@ -0,0 +1,198 @@
+from antlr4 import InputStream
+from antlr.WACCLexer import WACCLexer
+from instrumentation import timings, LEX, TAGS
+import time
+
+
+# Colours which depend only on the token type, the rest is painted by PainterVisitor after parsing
+TOKEN_TAGS = {
+    **dict.fromkeys([
+        WACCLexer.KW_BEGIN, WACCLexer.KW_END, WACCLexer.KW_SKIP, WACCLexer.KW_EXIT, WACCLexer.KW_RETURN,
+        WACCLexer.KW_STRUCT, WACCLexer.KW_FREE, WACCLexer.KW_NEWPAIR, WACCLexer.KW_NULL, WACCLexer.KW_PRINT,
+        WACCLexer.KW_PRINTLN, WACCLexer.KW_READ, WACCLexer.KW_IF, WACCLexer.KW_THEN, WACCLexer.KW_ELSE,
+        WACCLexer.KW_FI, WACCLexer.KW_WHILE, WACCLexer.KW_DO, WACCLexer.KW_DONE, WACCLexer.KW_IS,
+        WACCLexer.KW_CALL,
+    ], "keyword"),
+    **dict.fromkeys([
+        WACCLexer.KW_INT, WACCLexer.KW_BOOL, WACCLexer.KW_CHAR, WACCLexer.KW_STRING, WACCLexer.KW_PAIR,
+    ], "type"),
+    **dict.fromkeys([WACCLexer.INTEGER, WACCLexer.KW_TRUE, WACCLexer.KW_FALSE], "int"),
+    **dict.fromkeys([WACCLexer.STRING, WACCLexer.CHAR], "string"),
+    **dict.fromkeys([
+        WACCLexer.KW_FST, WACCLexer.KW_SND, WACCLexer.OP_ORD, WACCLexer.OP_CHR, WACCLexer.OP_LEN,
+        WACCLexer.OP_ADD, WACCLexer.OP_SUBT, WACCLexer.OP_MULT, WACCLexer.OP_DIV, WACCLexer.OP_MOD,
+        WACCLexer.OP_GT, WACCLexer.OP_GEQ, WACCLexer.OP_LT, WACCLexer.OP_LEQ, WACCLexer.OP_EQ,
+        WACCLexer.OP_NEQ, WACCLexer.OP_AND, WACCLexer.OP_OR, WACCLexer.OP_NOT, WACCLexer.SYM_EQUALS,
+        WACCLexer.SYM_PERIOD,
+    ], "operator"),
+    WACCLexer.COMMENT: "comment",
+}
+LEXICAL_TAGS = sorted(set(TOKEN_TAGS.values()))
+
+# Tokens which the lexer produces only for a quote which is not closed on the lexed lines
+OPEN_QUOTES = (WACCLexer.SYM_DOUBLEQUOTE, WACCLexer.SYM_SINGLEQUOTE)
+# Most dirty lines lexed at once
+MAX_CHUNK_LINES = 500
+
+
+class LexicalHighlighter:
+    ''' Keeps the lexical colouring of CodeText up to date incrementally
+
+        The highlighted tokens of every line are remembered as tuples
+        (tag, start column, number of lines spanned, end column) together with
+        a flag telling whether the line starts inside a token which began on
+        an earlier line (only literals can span lines). An edit only marks the
+        lines it touched as dirty; those are lexed again starting from the
+        closest line which begins outside of any token (or from a quote
+        which is still open), and the tags are updated only on the lines
+        whose tokens changed. '''
+
+    def __init__(self, code_text):
+        self.text = code_text
+        self.lexer = WACCLexer(InputStream(""))
+        self.lexer.removeErrorListeners()
+        # Index i holds line i + 1, None marks a line which has to be lexed again
+        self.lines = [None]
+        self.continued = [False]
+        # True for the lines with a quote which is not closed anywhere below
+        self.unclosed = [False]
+
+    def edit(self, first, old_last, new_last):
+        ''' Lines first..old_last were replaced with lines first..new_last '''
+        count = new_last - first + 1
+        self.lines[first - 1:old_last] = [None] * count
+        # The beginning of the first line did not change, the other lines are lexed together with it
+        self.continued[first:old_last] = [False] * (count - 1)
+        self.unclosed[first - 1:old_last] = [False] * count
+
+    def invalidate(self):
+        line_count = int(self.text.index('end - 1c').split('.')[0])
+        self.lines = [None] * line_count
+        self.continued = [False] * line_count
+        self.unclosed = [False] * line_count
+
+    def snapshot(self):
+        ''' The state of the highlighted text, handed over without copying when another text is shown '''
+        return self.lines, self.continued, self.unclosed
+
+    def restore(self, snapshot):
+        ''' Takes back the state of snapshot() for the same text loaded again, tagging all of it at once '''
+        self.lines, self.continued, self.unclosed = snapshot
+        ranges = {tag: [] for tag in LEXICAL_TAGS}
+        for line, tokens_on_line in enumerate(self.lines, 1):
+            for tag, begin, spanned, end_column in tokens_on_line or ():
+                ranges[tag] += (f"{line}.{begin}", f"{line + spanned}.{end_column}")
+        with timings.measure(TAGS):
+            for tag, tag_ranges in ranges.items():
+                if tag_ranges:
+                    self.text.tag_add(tag, *tag_ranges)
+
+    def is_dirty(self):
+        return None in self.lines
+
+    def highlight(self, first=1, last=None, max_lines=None):
+        ''' Lexes the dirty lines between first and last (the whole text by default)
+            Returns after about max_lines lines if it is given '''
+        if len(self.lines) != int(self.text.index('end - 1c').split('.')[0]):
+            # Only an edit missed by CodeText can get here, start from scratch
+            self.invalidate()
+        last = len(self.lines) if last is None else min(last, len(self.lines))
+        line = first
+        while line <= last:
+            try:
+                line = self.lines.index(None, line - 1, last) + 1
+            except ValueError:
+                return
+            end = self._relex(line, MAX_CHUNK_LINES if max_lines is None else min(max_lines, MAX_CHUNK_LINES))
+            if max_lines is not None:
+                max_lines -= end - line + 1
+                if max_lines <= 0:
+                    return
+            line = end + 1
+
+    def _relex(self, start, chunk_lines):
+        ''' Lexes a chunk of lines beginning with the dirty line start, returns the last lexed line '''
+        line_count = len(self.lines)
+        end = start
+        while end < line_count and end - start + 1 < chunk_lines and self.lines[end] is None:
+            end += 1
+        # A quote left open on an earlier line may be closed by one of these lines
+        try:
+            start = self.unclosed.index(True, 0, start - 1) + 1
+        except ValueError:
+            pass
+        # A line inside a multi-line token is lexed together with the line the token starts on
+        while start > 1 and self.continued[start - 1]:
+            start -= 1
+
+        # An open quote may be closed by a later line, which changes how these lines are lexed
+        lex_start = time.perf_counter()
+        while True:
+            source = self.text.get(f"{start}.0", f"{end}.end")
+            # A comment is only a comment once it is followed by a newline
+            self.lexer.inputStream = InputStream(source + "\n")
+            tokens = self.lexer.getAllTokens()
+            if end == line_count or not any(token.type in OPEN_QUOTES for token in tokens):
+                break
+            end = min(line_count, end + (end - start + 1))
+
+        new_lines, new_continued, new_unclosed = self._split_lines(source, tokens)
+        tags_start = time.perf_counter()
+        timings.record(LEX, (tags_start - lex_start) * 1000)
+        self.unclosed[start - 1:end] = new_unclosed
+        # The dirty lines are None, so the edited lines are always tagged again
+        retagged = set()
+        for offset, tokens_on_line in enumerate(new_lines):
+            line = start + offset
+            old_tokens = self.lines[line - 1]
+            if old_tokens != tokens_on_line or self.continued[line - 1] != new_continued[offset]:
+                # Tk moves the tags together with the text, so the old tags are still around the old tokens,
+                # though a multi-line token may have lost some of its lines since
+                last = min(end, line + max((token[2] for token in old_tokens or ()), default=0))
+                for tag in LEXICAL_TAGS:
+                    self.text.tag_remove(tag, f"{line}.0", f"{last + 1}.0")
+                retagged.update(range(line, last + 1))
+                self.lines[line - 1] = tokens_on_line
+                self.continued[line - 1] = new_continued[offset]
+        # A token reaching into a retagged line is tagged again as a whole
+        for offset, tokens_on_line in enumerate(new_lines):
+            line = start + offset
+            for tag, begin, spanned, end_column in tokens_on_line:
+                if any(line + i in retagged for i in range(spanned + 1)):
+                    self.text.tag_add(tag, f"{line}.{begin}", f"{line + spanned}.{end_column}")
+
+        # The line after the chunk used to continue a token which does not reach it any more
+        if end < line_count and self.continued[end]:
+            self.continued[end] = False
+            self.lines[end] = None
+        timings.record(TAGS, (time.perf_counter() - tags_start) * 1000)
+        return end
+
+    def _split_lines(self, source, tokens):
+        line_count = source.count('\n') + 1
+        lines = [[] for _ in range(line_count)]
+        continued = [False] * line_count
+        unclosed = [False] * line_count
+
+        for token in tokens:
+            if token.type == WACCLexer.WS:
+                continue
+            offset = token.line - 1
+            if token.type in OPEN_QUOTES:
+                unclosed[offset] = True
+            token_text = token.text
+            if token.type == WACCLexer.COMMENT:
+                # The newline which ends a comment does not take it onto the next line
+                token_text = token_text[:-1]
+            spanned = token_text.count('\n')
+            if spanned:
+                end_column = len(token_text) - token_text.rfind('\n') - 1
+                for line in range(offset + 1, offset + spanned + 1):
+                    continued[line] = True
+            else:
+                end_column = token.column + len(token_text)
+            tag = TOKEN_TAGS.get(token.type)
+            if tag is not None:
+                lines[offset].append((tag, token.column, spanned, end_column))
+
+        return [tuple(tokens_on_line) for tokens_on_line in lines], continued, unclosed
@@ -1,53 +1,143 @@
 import tkinter
 from tkinter import *
-from tkinter.filedialog import asksaveasfile, askopenfile
+from tkinter.filedialog import asksaveasfilename, askopenfile
 from tkinter.messagebox import showerror
 from tkinter import messagebox
 from tkinter import ttk
 import os
+import queue
+import stat
+import tempfile
+import threading
 
 from codeframe import CodeFrame
 from style import configure_styles
 from eventlog import EventLog
-from devtools import WOutput
+from devtools import WOutput, WTimings
+from buffers import BufferTabs
+from outline import Outline
 
 
 FILE_NAME = tkinter.NONE
 DIR_NAME = tkinter.NONE
 CODE_SIDE_MINSIZE = 300
 TOOLS_MINSIZE = CODE_SIDE_MINSIZE
+TIMINGS_MINSIZE = 100
+OUTLINE_MINSIZE = 150
 WINDOW_MINSIZE = CODE_SIDE_MINSIZE + TOOLS_MINSIZE
 HORISONTAL_SASH_WIDTH = 1
 
 COMPILE_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'compile')
 
+# bigger files get only the lexical colouring, WACC_IDE_LARGE_FILE_SIZE changes the limit
+LARGE_FILE_SIZE = int(os.environ.get("WACC_IDE_LARGE_FILE_SIZE", 1000000))  # characters
+SAVE_POLL_INTERVAL = 50  # ms
+
+# (path, text) written in order by the saver thread, (path, error or None) reported back to Tk
+pending_saves = queue.Queue()
+finished_saves = queue.Queue()
+saves_in_progress = 0
+# the permissions of a new file, os.umask can only be read by setting it
+UMASK = os.umask(0)
+os.umask(UMASK)
+
 
 def set_FILE_NAME(value):
     global FILE_NAME
     FILE_NAME = value
     dirname_update()
+    if tabs.active is not None and tabs.active.path != value:
+        tabs.rename(tabs.active, value)
+
+
+def show_status(text):
+    status_bar.configure(text=text)
 
 
 def new_file():
-    set_FILE_NAME(tkinter.NONE)
-    code_frame.text.delete('1.0', tkinter.END)
+    tabs.open(tkinter.NONE, "")
+    show_status("")
+
+
+def close_file(event=None):
+    tabs.close(tabs.active)
+
+
+def write_atomically(path, data):
+    ''' Writes a temporary file next to path and renames it, so the file is never left half written '''
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".wacc_save_")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+        # mkstemp creates the file readable only by its owner
+        mode = stat.S_IMODE(os.stat(path).st_mode) if os.path.exists(path) else 0o666 & ~UMASK
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def run_saver():
+    while True:
+        path, data = pending_saves.get()
+        try:
+            write_atomically(path, data)
+            finished_saves.put((path, None))
+        except OSError as e:
+            finished_saves.put((path, str(e)))
+        pending_saves.task_done()
+
+
+def save_in_background(path, data):
+    ''' Only taking the snapshot of the text is left to the main thread '''
+    global saves_in_progress
+    if saves_in_progress == 0:
+        root.after(SAVE_POLL_INTERVAL, poll_saves)
+    saves_in_progress += 1
+    show_status(f"Saving {os.path.basename(path)}...")
+    pending_saves.put((path, data))
+
+
+def poll_saves():
+    global saves_in_progress
+    while True:
+        try:
+            path, error = finished_saves.get_nowait()
+        except queue.Empty:
+            break
+        saves_in_progress -= 1
+        if error is None:
+            show_status(f"Saved {os.path.basename(path)}")
+        else:
+            show_status(f"Saving {os.path.basename(path)} failed")
+            showerror(title="Error", message=f"Saving file error: {error}")
+    if saves_in_progress:
+        root.after(SAVE_POLL_INTERVAL, poll_saves)
+
+
+def can_save():
+    if code_frame.text.loading:
+        show_status("The file can be saved once it is loaded")
+        return False
+    return True
 
 
 def save_file(event=None):
-    data = code_frame.text.get('1.0', tkinter.END)
-    out = open(FILE_NAME, 'w')
-    out.write(data)
-    out.close()
+    if not can_save():
+        return
+    save_in_background(FILE_NAME, code_frame.text.get('1.0', tkinter.END))
 
 
 def save_as():
-    out = asksaveasfile(mode='w', defaultextension='.txt')
-    set_FILE_NAME(out.name)
-    data = code_frame.text.get('1.0', tkinter.END)
-    try:
-        out.write(data.rstrip())
-    except Exception:
-        showerror(title="Error", message="Saving file error....")
+    if not can_save():
+        return
+    path = asksaveasfilename(defaultextension='.txt')
+    if not path:
+        return
+    set_FILE_NAME(path)
+    save_in_background(path, code_frame.text.get('1.0', tkinter.END).rstrip())
 
 
 def quick_save(event):
@@ -61,11 +151,15 @@ def open_file():
     inp = askopenfile(mode="r")
     if inp is None:
         return
-    set_FILE_NAME(inp.name)
 
     data = inp.read()
-    code_frame.text.delete('1.0', tkinter.END)
-    code_frame.text.insert('1.0', data)
+    inp.close()
+    name = os.path.basename(inp.name)
+    large = len(data) > LARGE_FILE_SIZE
+    show_status(f"Loading {name}...")
+    # a file which is open already is only switched to
+    tabs.open(inp.name, data, large, on_progress=lambda done: show_status(f"Loading {name}... {done:.0%}"),
+              on_done=lambda: show_status(f"{name} (large file, lexical colouring only)" if large else name))
 
 
 def about():
@@ -102,6 +196,8 @@ file_menu.add_command(label="Open", command=open_file)
 file_menu.add_command(label="Save", command=save_file)
 root.bind('<Control-Key-s>', quick_save)
 file_menu.add_command(label="Save as", command=save_as)
+file_menu.add_command(label="Close", command=close_file)
+root.bind('<Control-Key-w>', close_file)
 
 menu_bar.add_cascade(label="File", menu=file_menu)
 menu_bar.add_command(label="Run", command=run_prog)
@@ -110,11 +206,18 @@ menu_bar.add_command(label="Exit", command=root.quit)
 
 root.config(menu=menu_bar)
 
+status_bar = Label(root, anchor='w')
+status_bar.pack(side="bottom", fill="x")
+
+threading.Thread(target=run_saver, daemon=True).start()
+
 main_pane = PanedWindow(root, orient=HORIZONTAL)
 main_pane.pack(fill="both", expand=True)
 
-code_frame = CodeFrame(main_pane)
-main_pane.add(code_frame, minsize=CODE_SIDE_MINSIZE)
+code_side = Frame(main_pane)
+main_pane.add(code_side, minsize=CODE_SIDE_MINSIZE)
+code_frame = CodeFrame(code_side)
+code_frame.pack(side="bottom", fill="both", expand=True)
 
 devtool_pane = PanedWindow(main_pane, orient=VERTICAL, sashwidth=HORISONTAL_SASH_WIDTH)
 main_pane.add(devtool_pane, minsize=TOOLS_MINSIZE)
@@ -126,4 +229,18 @@ event_log = EventLog(devtool_pane)
 code_frame.link_event_log(event_log)
 devtool_pane.add(event_log, minsize=TOOLS_MINSIZE)
 
+outline = Outline(devtool_pane, code_frame.text)
+code_frame.link_outline(outline)
+devtool_pane.add(outline, minsize=OUTLINE_MINSIZE)
+
+wtimings = WTimings(devtool_pane)
+devtool_pane.add(wtimings, minsize=TIMINGS_MINSIZE)
+
+# all the tabs are shown in code_frame, only the one shown is in Tk
+tabs = BufferTabs(code_side, code_frame, event_log, woutput, on_switch=lambda buffer: set_FILE_NAME(buffer.path))
+tabs.pack(side="top", fill="x", before=code_frame)
+tabs.open(tkinter.NONE, "")
+
 root.mainloop()
+# the saves started just before closing the window are finished
+pending_saves.join()
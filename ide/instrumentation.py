@@ -0,0 +1,102 @@
+''' Timings of the hot paths of the IDE, shown in the Timings panel of the dev tools
+
+Every measurement is kept in a ring buffer as (time, phase, milliseconds),
+so recording costs a few microseconds and the memory used does not grow. '''
+from collections import deque
+from contextlib import contextmanager
+import cProfile
+import io
+import json
+import pstats
+import statistics
+import time
+
+LEX = "lex"
+PARSE = "parse"
+VISITOR = "visitor"
+TAGS = "tags"
+GUTTER = "gutter"
+BULBS = "bulbs"
+# from the request of a parse to its colours being applied, what the user waits for after typing
+PAINT = "paint"
+PHASES = [LEX, PARSE, VISITOR, TAGS, GUTTER, BULBS, PAINT]
+
+RING_SIZE = 2000
+PROFILE_LINES = 30
+
+
+class Timings:
+
+    def __init__(self):
+        self.samples = deque(maxlen=RING_SIZE)
+        # incremented on every sample, so that the panel knows when to refresh
+        self.count = 0
+        self.profile = None
+
+    def record(self, phase, milliseconds):
+        self.samples.append((time.time(), phase, milliseconds))
+        self.count += 1
+
+    @contextmanager
+    def measure(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, (time.perf_counter() - start) * 1000)
+
+    def recent(self, phase, count):
+        ''' Returns the durations of the last count samples of the phase, the oldest first '''
+        durations = []
+        for _, sample_phase, milliseconds in reversed(self.samples):
+            if sample_phase == phase:
+                durations.append(milliseconds)
+                if len(durations) == count:
+                    break
+        return durations[::-1]
+
+    def summary(self):
+        ''' Returns {phase: {count, last, median, p95, max, total}} of the buffered samples '''
+        by_phase = {}
+        for _, phase, milliseconds in self.samples:
+            by_phase.setdefault(phase, []).append(milliseconds)
+        result = {}
+        for phase, durations in by_phase.items():
+            ordered = sorted(durations)
+            result[phase] = {
+                "count": len(durations),
+                "last": durations[-1],
+                "median": statistics.median(ordered),
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "max": ordered[-1],
+                "total": sum(durations),
+            }
+        return result
+
+    def export_json(self, path):
+        with open(path, 'w') as f:
+            json.dump({"summary": self.summary(),
+                       "samples": [{"time": t, "phase": phase, "ms": ms} for t, phase, ms in self.samples]},
+                      f, indent=2)
+
+    def clear(self):
+        self.samples.clear()
+        self.count += 1
+
+    def is_profiling(self):
+        return self.profile is not None
+
+    def start_profile(self):
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop_profile(self):
+        ''' Stops the cProfile capture, returns the functions which took the most time as text '''
+        self.profile.disable()
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        self.profile = None
+        return stream.getvalue()
+
+
+timings = Timings()
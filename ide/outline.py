@@ -0,0 +1,92 @@
+from tkinter import *
+from tkinter import ttk
+from symbols import STRUCT
+
+FINDER_LIMIT = 50
+
+
+class Outline(ttk.Frame):
+    ''' The functions and structs of the code with a fuzzy finder above them
+        Clicking a symbol or pressing Enter in the finder moves the cursor to its declaration '''
+
+    def __init__(self, parent, code_text, *args, **kwargs):
+        kwargs['style'] = "CodeFrame.TFrame"
+        ttk.Frame.__init__(self, parent, *args, **kwargs)
+        self.code_text = code_text
+        self.symbols = None
+        # keys of the shown outline in order, an outline with the same keys only gets its line numbers updated
+        self.shown_keys = None
+        self.symbol_of_item = {}
+
+        self.label = Label(self, text="Outline (Ctrl+P to find a symbol)")
+        self.label.pack(side="top", fill="x")
+
+        self.query = StringVar(self)
+        self.finder = Entry(self, textvariable=self.query)
+        self.finder.pack(side="top", fill="x")
+        self.query.trace_add('write', lambda *args: self._refresh())
+
+        self.tree = ttk.Treeview(self, columns=("line",), selectmode='browse')
+        self.tree.heading("#0", text="Symbol")
+        self.tree.heading("line", text="Line")
+        self.tree.column("line", width=60, stretch=False, anchor='e')
+        self.scrollbar_v = Scrollbar(self, orient=VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.scrollbar_v.set)
+        self.scrollbar_v.pack(side="right", fill="y")
+        self.tree.pack(side="top", fill="both", expand=True)
+
+        self.tree.bind('<<TreeviewSelect>>', self._go_to_selected)
+        self.finder.bind('<Return>', self._go_to_first)
+        self.finder.bind('<Escape>', lambda event: self.code_text.focus_set())
+
+    def focus_finder(self, event=None):
+        self.finder.focus_set()
+        self.finder.select_range(0, END)
+        return 'break'
+
+    def show(self, symbols):
+        self.symbols = symbols
+        self._refresh()
+
+    def _refresh(self):
+        if self.symbols is None:
+            return
+        query = self.query.get().strip()
+        if query:
+            self._show_rows([(symbol, []) for symbol in self.symbols.find(query, FINDER_LIMIT)], qualified=True)
+        else:
+            self._show_rows(self.symbols.outline(), qualified=False)
+
+    def _show_rows(self, rows, qualified):
+        keys = [(symbol.key(), tuple(field.key() for field in fields)) for symbol, fields in rows] + [qualified]
+        if keys == self.shown_keys:
+            # the same symbols, only the lines may have moved
+            declarations = self.symbols.symbols
+            for item, symbol in self.symbol_of_item.items():
+                new_symbol = declarations[symbol.key()]
+                if new_symbol.line != symbol.line:
+                    self.tree.set(item, "line", new_symbol.line)
+                self.symbol_of_item[item] = new_symbol
+            return
+        self.shown_keys = keys
+        self.tree.delete(*self.tree.get_children())
+        self.symbol_of_item = {}
+        for symbol, fields in rows:
+            text = symbol.qualified_name() if qualified else symbol.name
+            kind = "struct " if symbol.kind == STRUCT else ""
+            item = self.tree.insert("", END, text=kind + text, values=(symbol.line,), open=True)
+            self.symbol_of_item[item] = symbol
+            for field in fields:
+                child = self.tree.insert(item, END, text=field.name, values=(field.line,))
+                self.symbol_of_item[child] = field
+
+    def _go_to_selected(self, event):
+        selection = self.tree.selection()
+        if selection:
+            self.code_text.go_to(self.symbol_of_item[selection[0]])
+
+    def _go_to_first(self, event):
+        children = self.tree.get_children()
+        if children:
+            self.code_text.go_to(self.symbol_of_item[children[0]])
+        return 'break'
@@ -1,16 +1,87 @@
 from antlr4 import *
-from antlr.WACCLexer import WACCLexer
 from antlr.WACCParser import WACCParser
 from antlr.WACCParserVisitor import WACCParserVisitor
-from io import StringIO
-from eventlog import SyntaxErrorListener
+from highlighter import LexicalHighlighter
+from diagnostics import DiagnosticsClient
+from instrumentation import timings, TAGS, PAINT
+from symbols import SymbolIndex, FUNCTION, STRUCT, FIELD
+from array import array
+import os
+import pickle
+import queue
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+PARSE_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parseworker.py")
+PARSE_POLL_INTERVAL = 16  # ms, about a frame
+# lines coloured per idle callback once the visible ones are done
+IDLE_SLICE_LINES = 100
+# the parse starts this long after the last edit, plus DEBOUNCE_FACTOR times the recent cost of a paint
+MIN_DEBOUNCE_DELAY = 150  # ms
+MAX_DEBOUNCE_DELAY = 1000  # ms
+DEBOUNCE_FACTOR = 2
+DEBOUNCE_SAMPLES = 8
+
+# Tags of PainterVisitor, Tk knows them prefixed so that LexicalHighlighter never removes them
+CONTEXT_TAGS = ["keyword", "type", "declaration", "function", "attribute"]
+CONTEXT_TAG_INDEX = {tag: index for index, tag in enumerate(CONTEXT_TAGS)}
+CONTEXT_TAG_PREFIX = "context "
+NO_SPANS = array('i')
+
+
+def spans_by_line(painting_commands, line_count):
+    ''' Packs the painting commands into an array of (tag index, begin column, end column) per line '''
+    lines = {}
+    for tag, start, end in painting_commands:
+        line, begin = map(int, start.split('.'))
+        lines.setdefault(line, set()).add((CONTEXT_TAG_INDEX[tag], begin, int(end.split('.')[1])))
+    spans = [NO_SPANS] * line_count
+    for line, line_spans in lines.items():
+        if line <= line_count:
+            spans[line - 1] = array('i', [number for span in sorted(line_spans) for number in span])
+    return spans
+
+
+def unpack_spans(spans):
+    return set(zip(spans[0::3], spans[1::3], spans[2::3]))
+
+
+class AnalysisSnapshot:
+    ''' What Painter knows about a text, kept by the tabs which are not shown '''
+
+    # rough sizes in bytes, only used to keep the cached snapshots under a limit
+    LINE_SIZE = 64
+    TOKEN_SIZE = 120
+
+    def __init__(self, lexical, context_spans, errors, symbols, complete):
+        self.lexical = lexical
+        self.context_spans = context_spans
+        self.errors = errors
+        self.symbols = symbols
+        # False if the text changed since its last parse
+        self.complete = complete
+        self.cached_size = None
+
+    def size(self):
+        if self.cached_size is None:
+            lines = self.lexical[0]
+            tokens = sum(len(tokens_on_line) for tokens_on_line in lines if tokens_on_line)
+            spans = sum(len(line_spans) for line_spans in self.context_spans if line_spans)
+            self.cached_size = len(lines) * self.LINE_SIZE + tokens * self.TOKEN_SIZE + spans * NO_SPANS.itemsize
+        return self.cached_size
 
 
 class PainterVisitor(WACCParserVisitor):
-    ''' Visits the nodes which are relevant for painting, i.e. terminals '''
+    ''' Visits the nodes whose colour depends on the context, i.e. identifiers and separators
+        The colours of keywords, types, literals, operators and comments depend only on the token type,
+        those are painted by LexicalHighlighter without parsing '''
 
     def __init__(self):
         self.painting_commands = []
+        self.symbols = SymbolIndex()
 
     def paint_token(self, token, tag):
         ''' Associating tag with token start and end coordinates '''
@@ -35,21 +106,9 @@ class PainterVisitor(WACCParserVisitor):
     def paint_keyword(self, token):
         self.paint_token(token, "keyword")
 
-    def paint_main_text(self, token):
-        self.paint_token(token, "main text")
-
-    def paint_string(self, token):
-        self.paint_token(token, "string")
-
-    def paint_int(self, token):
-        self.paint_token(token, "int")
-
     def paint_type(self, token):
         self.paint_token(token, "type")
 
-    def paint_operator(self, token):
-        self.paint_token(token, "operator")
-
     def paint_declaration(self, token):
         self.paint_token(token, "declaration")
 
@@ -59,209 +118,52 @@ class PainterVisitor(WACCParserVisitor):
     def paint_attribute(self, token):
         self.paint_token(token, "attribute")
 
-    def paint_base_type(self, type_ctx):
-        if isinstance(type_ctx, WACCParser.BaseTypeIntContext):
-            self.paint_type(type_ctx.KW_INT())
-        elif isinstance(type_ctx, WACCParser.BaseTypeBoolContext):
-            self.paint_type(type_ctx.KW_BOOL())
-        elif isinstance(type_ctx, WACCParser.BaseTypeCharContext):
-            self.paint_type(type_ctx.KW_CHAR())
-        elif isinstance(type_ctx, WACCParser.BaseTypeStringContext):
-            self.paint_type(type_ctx.KW_STRING())
-        else:
-            raise TypeError(f"Incorrect type context {type(type_ctx)}")
-
-    def paint_array_type(self, type_ctx):
-        if isinstance(type_ctx, WACCParser.ArrayTypeBaseTypeContext):
-            self.paint_base_type(type_ctx.baseType())
-        elif isinstance(type_ctx, WACCParser.ArrayTypeArrayTypeContext):
-            self.paint_array_type(type_ctx.arrayType())
-        elif isinstance(type_ctx, WACCParser.ArrayTypePairTypeContext):
-            self.paint_pair_type(type_ctx.pairType())
-        else:
-            raise TypeError(f"Incorrect type context {type(type_ctx)}")
-
-    def paint_pair_type(self, type_ctx):
-        self.paint_type(type_ctx.KW_PAIR())
-        for elem in [type_ctx.left, type_ctx.right]:
-            if isinstance(elem, WACCParser.PairElemTypeBaseTypeContext):
-                self.paint_base_type(elem.baseType())
-            elif isinstance(elem, WACCParser.PairElemTypeArrayTypeContext):
-                self.paint_array_type(elem.arrayType())
-            elif isinstance(elem, WACCParser.PairElemTypeKwPairContext):
-                self.paint_type(elem.KW_PAIR())
-            else:
-                raise TypeError(f"Incorrect type context {type(elem)}")
-
-    def visitProgram(self, ctx:WACCParser.ProgramContext):
-        self.paint_keyword(ctx.KW_BEGIN())
-        self.paint_keyword(ctx.KW_END())
-        return self.visitChildren(ctx)
-
-    def visitTypeBaseType(self, ctx:WACCParser.TypeBaseTypeContext):
-        self.paint_base_type(ctx.baseType())
-        return self.visitChildren(ctx)
-
-    def visitTypeArrayType(self, ctx:WACCParser.TypeArrayTypeContext):
-        self.paint_array_type(ctx.arrayType())
-        return self.visitChildren(ctx)
-
-    def visitTypePairType(self, ctx:WACCParser.TypePairTypeContext):
-        self.paint_pair_type(ctx.pairType())
-        return self.visitChildren(ctx)
-
     def visitArrayLiterAssignRhs(self, ctx:WACCParser.ArrayLiterAssignRhsContext):
         for comma in ctx.SYM_COMMA():
             self.paint_keyword(comma)
         return self.visitChildren(ctx)
 
-    def visitPairElemFst(self, ctx:WACCParser.PairElemFstContext):
-        self.paint_operator(ctx.KW_FST())
-        return self.visitChildren(ctx)
-
-    def visitPairElemSnd(self, ctx:WACCParser.PairElemSndContext):
-        self.paint_operator(ctx.KW_SND())
-        return self.visitChildren(ctx)
-
-    def visitPairType(self, ctx:WACCParser.PairTypeContext):
-        self.paint_type(ctx.KW_PAIR())
-        return self.visitChildren(ctx)
-
-    def visitPairElemTypeBaseType(self, ctx:WACCParser.PairElemTypeBaseTypeContext):
-        self.paint_base_type(ctx.baseType())
-        return self.visitChildren(ctx)
-
-    def visitPairElemTypeArrayType(self, ctx:WACCParser.PairElemTypeArrayTypeContext):
-        self.paint_array_type(ctx.arrayType())
-        return self.visitChildren(ctx)
-
-    def visitPairElemTypeKwPair(self, ctx:WACCParser.PairElemTypeKwPairContext):
-        self.paint_type(ctx.KW_PAIR())
-        return self.visitChildren(ctx)
-
-    def visitLiteralInteger(self, ctx:WACCParser.LiteralIntegerContext):
-        self.paint_int(ctx.INTEGER())
-        return self.visitChildren(ctx)
-
-    def visitLiteralBoolean(self, ctx:WACCParser.LiteralBooleanContext):
-        self.paint_int(ctx.value)
-        return self.visitChildren(ctx)
-
-    def visitLiteralChar(self, ctx:WACCParser.LiteralCharContext):
-        self.paint_string(ctx.CHAR())
-        return self.visitChildren(ctx)
-
-    def visitLiteralString(self, ctx:WACCParser.LiteralStringContext):
-        self.paint_string(ctx.STRING())
-        return self.visitChildren(ctx)
-
-    def visitLiteralPair(self, ctx:WACCParser.LiteralPairContext):
-        self.paint_keyword(ctx.KW_NULL())
-        return self.visitChildren(ctx)
-
-    def visitExprBinary(self, ctx:WACCParser.ExprBinaryContext):
-        self.paint_operator(ctx.binOp)
-        return self.visitChildren(ctx)
-
-    def visitExprUnary(self, ctx:WACCParser.ExprUnaryContext):
-        self.paint_operator(ctx.unOp)
-        return self.visitChildren(ctx)
-
-    def visitAssignRhsNewPair(self, ctx:WACCParser.AssignRhsNewPairContext):
-        self.paint_keyword(ctx.KW_NEWPAIR())
-        return self.visitChildren(ctx)
-
     def visitAssignRhsCall(self, ctx:WACCParser.AssignRhsCallContext):
-        self.paint_keyword(ctx.KW_CALL())
         self.paint_function(ctx.IDENTIFIER())
-        return self.visitChildren(ctx)
-
-    def visitStatWhileDo(self, ctx:WACCParser.StatWhileDoContext):
-        self.paint_keyword(ctx.KW_WHILE())
-        self.paint_keyword(ctx.KW_DO())
-        self.paint_keyword(ctx.KW_DONE())
-        return self.visitChildren(ctx)
-
-    def visitStatInit(self, ctx:WACCParser.StatInitContext):
-        self.paint_operator(ctx.SYM_EQUALS())
-        return self.visitChildren(ctx)
-
-    def visitStatStore(self, ctx:WACCParser.StatStoreContext):
-        self.paint_operator(ctx.SYM_EQUALS())
-        return self.visitChildren(ctx)
-
-    def visitStatRead(self, ctx:WACCParser.StatReadContext):
-        self.paint_keyword(ctx.KW_READ())
-        return self.visitChildren(ctx)
-
-    def visitStatBeginEnd(self, ctx:WACCParser.StatBeginEndContext):
-        self.paint_keyword(ctx.KW_BEGIN())
-        self.paint_keyword(ctx.KW_END())
-        return self.visitChildren(ctx)
-
-    def visitStatFree(self, ctx:WACCParser.StatFreeContext):
-        self.paint_keyword(ctx.KW_FREE())
-        return self.visitChildren(ctx)
-
-    def visitStatPrint(self, ctx:WACCParser.StatPrintContext):
-        self.paint_keyword(ctx.KW_PRINT())
-        return self.visitChildren(ctx)
-
-    def visitStatPrintln(self, ctx:WACCParser.StatPrintlnContext):
-        self.paint_keyword(ctx.KW_PRINTLN())
-        return self.visitChildren(ctx)
-
-    def visitStatExit(self, ctx:WACCParser.StatExitContext):
-        self.paint_keyword(ctx.KW_EXIT())
+        if ctx.IDENTIFIER() is not None:
+            self.symbols.refer(FUNCTION, ctx.IDENTIFIER().getSymbol())
         return self.visitChildren(ctx)
 
     def visitStatJoin(self, ctx:WACCParser.StatJoinContext):
         self.paint_function(ctx.SYM_SEMICOLON())
         return self.visitChildren(ctx)
 
-    def visitStatSkip(self, ctx:WACCParser.StatSkipContext):
-        self.paint_keyword(ctx.KW_SKIP())
-        return self.visitChildren(ctx)
-
-    def visitStatReturn(self, ctx:WACCParser.StatReturnContext):
-        self.paint_keyword(ctx.KW_RETURN())
-        return self.visitChildren(ctx)
-
-    def visitStatIfThenElse(self, ctx:WACCParser.StatIfThenElseContext):
-        self.paint_keyword(ctx.KW_IF())
-        self.paint_keyword(ctx.KW_THEN())
-        self.paint_keyword(ctx.KW_ELSE())
-        self.paint_keyword(ctx.KW_FI())
-        return self.visitChildren(ctx)
-
     def visitParamList(self, ctx:WACCParser.ParamListContext):
         for comma in ctx.SYM_COMMA():
             self.paint_function(comma)
         return self.visitChildren(ctx)
 
     def visitFunc(self, ctx:WACCParser.FuncContext):
-        self.paint_keyword(ctx.KW_IS())
-        self.paint_keyword(ctx.KW_END())
         self.paint_declaration(ctx.IDENTIFIER())
+        if ctx.IDENTIFIER() is not None:
+            self.symbols.declare(FUNCTION, ctx.IDENTIFIER().getSymbol())
         return self.visitChildren(ctx)
 
     ### Struct feature methods:
 
     def visitStruct(self, ctx:WACCParser.StructContext):
-        self.paint_keyword(ctx.KW_STRUCT())
-        self.paint_keyword(ctx.KW_BEGIN())
-        self.paint_keyword(ctx.KW_END())
         self.paint_declaration(ctx.IDENTIFIER())
+        if ctx.IDENTIFIER() is not None:
+            name = ctx.IDENTIFIER().getText()
+            self.symbols.declare(STRUCT, ctx.IDENTIFIER().getSymbol())
+            if ctx.structElems() is not None:
+                for field in ctx.structElems().param():
+                    if field.IDENTIFIER() is not None:
+                        self.symbols.declare(FIELD, field.IDENTIFIER().getSymbol(), parent=name)
         return self.visitChildren(ctx)
 
     def visitStructType(self, ctx:WACCParser.StructTypeContext):
-        self.paint_keyword(ctx.KW_STRUCT())
         self.paint_type(ctx.IDENTIFIER())
+        if ctx.IDENTIFIER() is not None:
+            self.symbols.refer(STRUCT, ctx.IDENTIFIER().getSymbol())
         return self.visitChildren(ctx)
 
     def visitStructElem(self, ctx:WACCParser.StructElemContext):
-        for period in ctx.SYM_PERIOD():
-            self.paint_operator(period)
         for elem in ctx.IDENTIFIER()[1:]:
             self.paint_attribute(elem)
         return self.visitChildren(ctx)
@@ -272,6 +174,52 @@ class PainterVisitor(WACCParserVisitor):
         return self.visitChildren(ctx)
 
 
+class ParseWorker:
+    ''' Client of parseworker.py, the ANTLR runtime holds the GIL, so a thread would block Tk too '''
+
+    def __init__(self):
+        self.proc = None
+        self.results = queue.Queue()
+
+    def _start(self):
+        self.proc = subprocess.Popen([sys.executable, PARSE_WORKER_SCRIPT],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        threading.Thread(target=self._read_results, args=(self.proc.stdout,), daemon=True).start()
+
+    def is_alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def request(self, version, text):
+        if not self.is_alive():
+            self._start()
+        try:
+            pickle.dump((version, text), self.proc.stdin)
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError):
+            # started again by the next request
+            self.proc = None
+
+    def _read_results(self, stream):
+        while True:
+            try:
+                self.results.put(pickle.load(stream))
+            except (EOFError, pickle.UnpicklingError, OSError):
+                return
+
+    def latest_result(self):
+        ''' Returns the newest (version, spans, errors, timings) received or None '''
+        result = None
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                return result
+
+    def stop(self):
+        if self.is_alive():
+            self.proc.stdin.close()
+
+
 class Painter:
     ''' Works with ANTLR and CodeText to create syntax highlight
         Also delegates With error highlighting '''
@@ -279,67 +227,255 @@ class Painter:
     def __init__(self, code_text):
         self.text = code_text
         self.event_log = None
+        self.outline = None
+        self.errors = []
+        # declarations of the last parse, marked in the text so that they can be found after edits
+        self.symbols = SymbolIndex()
+        self.symbol_marks = set()
+        self.highlighter = LexicalHighlighter(code_text)
+        # spans of the context tags painted on every line, None for the lines edited since
+        self.context_spans = [None]
+        # incremented on every edit, results of parsing older versions are dropped
+        self.version = 0
+        self.requested_version = None
+        self.worker = ParseWorker()
+        self.poll_job = None
+        # semantic errors come from the compiler daemon, once the parser found no syntax errors
+        self.diagnostics = DiagnosticsClient()
+        self.checked_version = None
+        self.diagnostics_job = None
+        # spans of the last parse which are not painted yet, painted from context_cursor on when idle
+        self.pending_spans = None
+        self.context_cursor = 0
+        self.idle_job = None
+        self.paint_started = None
+        # set for large files, which are coloured without the parser
+        self.lexical_only = False
+        # version of the text the painted spans and errors belong to
+        self.applied_version = None
+
+    def note_edit(self, first, old_last, new_last):
+        ''' Lines first..old_last of the text were replaced with lines first..new_last '''
+        self.version += 1
+        self.highlighter.edit(first, old_last, new_last)
+        self.context_spans[first - 1:old_last] = [None] * (new_last - first + 1)
+        self.symbols.note_edit(first, old_last, new_last)
+        # the line numbers of the parse do not match the text any more
+        self.pending_spans = None
+
+    def reset(self):
+        ''' The whole text was replaced without note_edit, e.g. by CodeText.load '''
+        self.version += 1
+        self.highlighter.invalidate()
+        self.context_spans = [None] * len(self.highlighter.lines)
+        self.pending_spans = None
+        self._show_symbols(SymbolIndex())
+
+    def snapshot(self):
+        ''' Returns the state of the painted text, given up by the Painter which moves on to another text '''
+        spans = self.pending_spans if self.pending_spans is not None else self.context_spans
+        return AnalysisSnapshot(self.highlighter.snapshot(), spans, self.text.errors, self.symbols,
+                                self.lexical_only or self.applied_version == self.version)
+
+    def restore(self, snapshot):
+        ''' Paints the text of snapshot, which was loaded again without note_edit, without parsing it again '''
+        self.version += 1
+        self.highlighter.restore(snapshot.lexical)
+        # the tags went away with the old text, the spans are painted like a new parse
+        self.context_spans = [NO_SPANS] * len(self.highlighter.lines)
+        self.pending_spans = [spans if spans is not None else NO_SPANS for spans in snapshot.context_spans]
+        self.context_cursor = 0
+        self.errors = snapshot.errors
+        self.paint_errors()
         self.errors = []
+        self._show_symbols(snapshot.symbols)
+        self.paint_lexical()
+        if snapshot.complete:
+            self.applied_version = self.version
+        else:
+            self.paint()
 
-    def paint_comments(self, text):
-        line_counter = 0
-        for line in StringIO(text):
-            line_counter += 1
-            if '#' not in line:
-                continue
-            comment_start = line.find('#')
-            self.text.tag_add("comment", f'{line_counter}.{comment_start}', f'{line_counter}.end')
+    def paint_lexical(self):
+        ''' Colours the tokens of the visible lines right away, without waiting for the parser
+            The rest of the document is coloured a slice at a time when Tk is idle '''
+        if self.text.loading:
+            # CodeText.load paints the text once all of it is in
+            return
+        first, last = self.text.visible_lines()
+        self.highlighter.highlight(first, last)
+        if self.pending_spans is not None:
+            self._paint_context(first - 1, min(last, len(self.pending_spans)))
+        self._schedule_idle_painting()
+
+    def _schedule_idle_painting(self):
+        if self.idle_job is None and (self.pending_spans is not None or self.highlighter.is_dirty()):
+            self.idle_job = self.text.after_idle(self._paint_idle)
+
+    def _paint_idle(self):
+        self.idle_job = None
+        if self.text.loading:
+            return
+        if self.highlighter.is_dirty():
+            self.highlighter.highlight(max_lines=IDLE_SLICE_LINES)
+        elif self.pending_spans is not None:
+            end = min(self.context_cursor + IDLE_SLICE_LINES, len(self.pending_spans))
+            self._paint_context(self.context_cursor, end)
+            self.context_cursor = end
+            if end == len(self.pending_spans):
+                self.pending_spans = None
+        self._schedule_idle_painting()
 
     def paint(self):
         '''
-        "Compiling" the code and getting the sequence of commands to color the code
-        command is a triple which contains tag name, start, end
+        "Compiling" the code in the parse worker and getting the spans to color the code
+        the spans of every line are packed into one array of triples: tag index, begin column, end column
         for example:
-            ('keyword', '5.0', '6.0')
-
-        visitor.painting_commands :: [(tag :: str, start :: str, end :: str)] '''
-
-        text_content = self.text.get("1.0", "end")
-        self.paint_comments(text_content)
+            array('i', [0, 0, 5, 0, 9, 13])   # 'keyword' at 5.0-5.5 and 5.9-5.13
 
-        lexer = WACCLexer(InputStream(text_content))
-        tokens = CommonTokenStream(lexer)
+        spans :: [array('i')] '''
 
-        parser = WACCParser(tokens)
-
-        parser.removeErrorListeners()
-        errorListener = SyntaxErrorListener(self.errors)
-        parser.addErrorListener(errorListener)
+        if self.text.loading:
+            return
+        # comments and the other context free colours are kept up to date by paint_lexical
+        self.paint_lexical()
+        if self.lexical_only:
+            self.event_log.show(self.event_log.LEXICAL_ONLY_MSG)
+            return
 
-        tree = parser.program()
+        self.requested_version = self.version
+        self.paint_started = time.perf_counter()
+        self.worker.request(self.version, self.text.get("1.0", "end"))
+        if self.poll_job is None:
+            self._poll()
+
+    def _poll(self):
+        self.poll_job = None
+        result = self.worker.latest_result()
+        if result is not None and result[0] == self.version:
+            self.requested_version = None
+            self._apply(*result[1:])
+            return
+        # after an edit the result would be stale, the next paint() asks for a new one
+        if self.requested_version == self.version and self.worker.is_alive():
+            self.poll_job = self.text.after(PARSE_POLL_INTERVAL, self._poll)
+
+    def debounce_delay(self):
+        ''' Milliseconds between the last edit and the next paint, longer if the recent paints were slow '''
+        recent = timings.recent(PAINT, DEBOUNCE_SAMPLES)
+        cost = statistics.median(recent) if recent else 0
+        return int(min(MAX_DEBOUNCE_DELAY, MIN_DEBOUNCE_DELAY + DEBOUNCE_FACTOR * cost))
+
+    def _apply(self, spans, errors, phase_times, symbols):
+        if spans is None:
+            return
+        for phase, milliseconds in phase_times.items():
+            timings.record(phase, milliseconds)
+        self._show_symbols(symbols)
 
         # Removing errors which cannot be highlighted
-        filtered_errors = []
-        for er in self.errors:
-            if self.text.get(er.char_pos()):
-                filtered_errors.append(er)
-        self.errors = filtered_errors
-
-        visitor = PainterVisitor()
-        visitor.visit(tree)
+        self.errors = [er for er in errors if self.text.get(er.char_pos())]
 
+        if not self.errors:
+            self.checked_version = self.version
+            self.diagnostics.request(self.version, self.text.get("1.0", "end"))
+            if self.diagnostics_job is None:
+                self._poll_diagnostics()
         self.pass_errors_to_event_log()
 
-        for command in visitor.painting_commands:
-            self.text.tag_add(*command)
+        if len(self.context_spans) != len(spans):
+            self.context_spans = [None] * len(spans)
+        self.pending_spans = spans
+        self.context_cursor = 0
+        self.applied_version = self.version
+        self.paint_lexical()
+        timings.record(PAINT, (time.perf_counter() - self.paint_started) * 1000)
+
+    def _poll_diagnostics(self):
+        self.diagnostics_job = None
+        result = self.diagnostics.latest_result()
+        if result is not None and result[0] == self.version:
+            self.checked_version = None
+            if result[1] is not None:
+                self.errors = [er for er in result[1] if self.text.get(er.char_pos())]
+                self.pass_errors_to_event_log(semantics_checked=True)
+            return
+        # after an edit the errors would be stale, the next parse without syntax errors asks again
+        if self.checked_version == self.version and not self.diagnostics.unavailable:
+            self.diagnostics_job = self.text.after(PARSE_POLL_INTERVAL, self._poll_diagnostics)
+
+    def _paint_context(self, start, end):
+        ''' Changes only the tags of the spans which differ from the painted ones on lines start + 1..end,
+            with one Tcl call per tag '''
+        with timings.measure(TAGS):
+            self._diff_context(start, end)
+
+    def _diff_context(self, start, end):
+        removed = [[] for _ in CONTEXT_TAGS]
+        added = [[] for _ in CONTEXT_TAGS]
+        for index in range(start, end):
+            new_spans = self.pending_spans[index]
+            old_spans = self.context_spans[index]
+            if old_spans == new_spans:
+                continue
+            line = index + 1
+            new_set = unpack_spans(new_spans)
+            if old_spans is None:
+                # Tk could have moved any tag onto an edited line
+                old_set = set()
+                for ranges in removed:
+                    ranges += (f"{line}.0", f"{line + 1}.0")
+            else:
+                old_set = unpack_spans(old_spans)
+                for tag, begin, end in old_set - new_set:
+                    removed[tag] += (f"{line}.{begin}", f"{line}.{end}")
+            for tag, begin, end in new_set - old_set:
+                added[tag] += (f"{line}.{begin}", f"{line}.{end}")
+            self.context_spans[index] = new_spans
+
+        for tag, ranges in zip(CONTEXT_TAGS, removed):
+            if ranges:
+                # tag_remove of tkinter takes a single range
+                self.text.tk.call(self.text._w, 'tag', 'remove', CONTEXT_TAG_PREFIX + tag, *ranges)
+        for tag, ranges in zip(CONTEXT_TAGS, added):
+            if ranges:
+                self.text.tag_add(CONTEXT_TAG_PREFIX + tag, *ranges)
 
     def attach_event_log(self, event_log):
         self.event_log = event_log
 
+    def attach_outline(self, outline):
+        self.outline = outline
+
+    @staticmethod
+    def symbol_mark(symbol):
+        return f"symbol:{symbol.kind}:{symbol.qualified_name()}"
+
+    def _show_symbols(self, symbols):
+        ''' Marks every declaration, Tk moves the marks with the text until the next parse '''
+        self.symbols = symbols
+        marks = set()
+        for symbol in symbols.symbols.values():
+            mark = self.symbol_mark(symbol)
+            self.text.mark_set(mark, symbol.char_pos())
+            self.text.mark_gravity(mark, 'left')
+            marks.add(mark)
+        for mark in self.symbol_marks - marks:
+            self.text.mark_unset(mark)
+        self.symbol_marks = marks
+        if self.outline is not None:
+            self.outline.show(symbols)
+
     def paint_errors(self):
         self.text.tag_remove('error', '1.0', 'end')
-        self.text.clear_error_bulbs()
+        ranges = []
         for er in self.errors:
-            self.text.tag_add('error', er.char_pos(),
-                              f"{er.line}.{er.charPositionInLine + 1}")
-            self.text.add_error_bulb(er)
-
-    def pass_errors_to_event_log(self):
-        self.event_log.log(self.errors)
+            ranges += [er.char_pos(), f"{er.line}.{er.charPositionInLine + 1}"]
+        if ranges:
+            # one Tcl call however many errors the parser recovered from
+            self.text.tag_add('error', *ranges)
+        self.text.show_error_bulbs(self.errors)
+
+    def pass_errors_to_event_log(self, semantics_checked=False):
+        self.event_log.log(self.errors, semantics_checked)
         self.paint_errors()
         self.errors = []
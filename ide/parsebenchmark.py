@@ -0,0 +1,72 @@
+''' Measures how long the IDE takes to parse the sample programs
+
+Compares a fresh lexer and parser with full LL prediction for every program
+(what the parse worker used to do) with the warmed up ReusableParser. '''
+import argparse
+import glob
+import os
+import statistics
+import time
+
+from antlr4 import InputStream, CommonTokenStream
+from antlr.WACCLexer import WACCLexer
+from antlr.WACCParser import WACCParser
+from eventlog import SyntaxErrorListener
+from painter import PainterVisitor, spans_by_line
+from parseworker import ReusableParser
+
+SAMPLE_PATTERN = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'wacc_test',
+                              'sample_programs', '**', '*.wacc')
+
+
+def parse_fresh(text):
+    lexer = WACCLexer(InputStream(text))
+    lexer.removeErrorListeners()
+    parser = WACCParser(CommonTokenStream(lexer))
+    errors = []
+    parser.removeErrorListeners()
+    parser.addErrorListener(SyntaxErrorListener(errors))
+    visitor = PainterVisitor()
+    visitor.visit(parser.program())
+    return spans_by_line(visitor.painting_commands, text.count('\n')), errors
+
+
+def measure(parse, texts, repeat):
+    ''' Returns the median time of every text in ms '''
+    times = []
+    for text in texts:
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parse(text)
+            samples.append((time.perf_counter() - start) * 1000)
+        times.append(statistics.median(samples))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures the parsing done by the IDE on the sample programs')
+    parser.add_argument('-r', '--repeat', default=3, type=int, help='number of parses of every file')
+    parser.add_argument('paths', nargs='*', help='files to parse (by default all the sample programs)')
+    options = parser.parse_args()
+
+    paths = options.paths or sorted(glob.glob(SAMPLE_PATTERN, recursive=True))
+    texts = []
+    for path in paths:
+        with open(path) as f:
+            texts.append(f.read())
+
+    reusable = ReusableParser()
+    reusable.warm_up()
+    fresh_times = measure(parse_fresh, texts, options.repeat)
+    reusable_times = measure(reusable.parse, texts, options.repeat)
+
+    print(f"{len(texts)} files, median of {options.repeat} parses of every file")
+    print(f"{'':12} {'total (ms)':>12} {'median (ms)':>12} {'slowest (ms)':>12}")
+    for name, times in [("fresh LL", fresh_times), ("reusable", reusable_times)]:
+        print(f"{name:12} {sum(times):12.1f} {statistics.median(times):12.2f} {max(times):12.2f}")
+    print(f"{reusable.ll_parses} of {len(texts) * options.repeat} reusable parses fell back to LL prediction")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+''' Parses the code for the IDE in a separate process
+
+The IDE writes pickled (version, text) requests to the stdin of this script
+and reads pickled (version, spans, errors, timings, symbols) results from its
+stdout, all but the version None if the parse failed. Only the newest request is parsed, a
+parse is abandoned as soon as a newer request arrives and no result is sent
+for it. '''
+import os
+import pickle
+import sys
+import threading
+import time
+import traceback
+
+from antlr4 import InputStream, CommonTokenStream, PredictionMode
+from antlr4.error.ErrorStrategy import BailErrorStrategy, DefaultErrorStrategy
+from antlr4.error.Errors import ParseCancellationException
+from antlr4.tree.Tree import ParseTreeListener
+from antlr.WACCLexer import WACCLexer
+from antlr.WACCParser import WACCParser
+from eventlog import SyntaxErrorListener
+from painter import PainterVisitor, spans_by_line
+from instrumentation import PARSE, VISITOR
+
+END_OF_REQUESTS = "end"
+# parsed once at startup, so the first real parse finds the DFA cache of the parser filled
+WARM_UP_PROGRAM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "warmup.wacc")
+
+
+class ParseCancelled(Exception):
+    pass
+
+
+class CancellationListener(ParseTreeListener):
+    ''' Stops the parser once the result is not going to be used '''
+
+    def __init__(self):
+        self.cancelled = lambda: False
+
+    def enterEveryRule(self, ctx):
+        if self.cancelled():
+            raise ParseCancelled()
+
+
+class ReusableParser:
+    ''' One lexer and parser reset for every text
+
+        The text is parsed with SLL prediction first, which is much cheaper and
+        succeeds on nearly all programs. Only if it fails the text is parsed
+        again with full LL prediction and error recovery, so that the reported
+        syntax errors are the same as with LL alone. '''
+
+    def __init__(self):
+        self.lexer = WACCLexer(InputStream(""))
+        self.lexer.removeErrorListeners()
+        self.tokens = CommonTokenStream(self.lexer)
+        self.parser = WACCParser(self.tokens)
+
+        self.errors = []
+        self.parser.removeErrorListeners()
+        self.parser.addErrorListener(SyntaxErrorListener(self.errors))
+        self.cancellation = CancellationListener()
+        self.ll_parses = 0
+
+    def _reset_parser(self):
+        # Parser.reset of the Python runtime fails while any parse listener is attached
+        self.parser.removeParseListeners()
+        self.parser.setInputStream(self.tokens)
+        self.parser.addParseListener(self.cancellation)
+
+    def parse(self, text, cancelled=lambda: False):
+        ''' Returns the spans painted by PainterVisitor on every line, the syntax errors of the text,
+            the milliseconds spent by the parser and the visitor and the SymbolIndex of the text '''
+        start = time.perf_counter()
+        self.cancellation.cancelled = cancelled
+        self.lexer.inputStream = InputStream(text)
+        self.tokens.setTokenSource(self.lexer)
+        self.errors.clear()
+
+        self._reset_parser()
+        self.parser._interp.predictionMode = PredictionMode.SLL
+        self.parser._errHandler = BailErrorStrategy()
+        try:
+            tree = self.parser.program()
+        except ParseCancellationException:
+            self.ll_parses += 1
+            self.tokens.seek(0)
+            self.errors.clear()
+            self._reset_parser()
+            self.parser._interp.predictionMode = PredictionMode.LL
+            self.parser._errHandler = DefaultErrorStrategy()
+            tree = self.parser.program()
+        parsed = time.perf_counter()
+
+        visitor = PainterVisitor()
+        visitor.visit(tree)
+        spans = spans_by_line(visitor.painting_commands, text.count('\n'))
+        timings = {PARSE: (parsed - start) * 1000, VISITOR: (time.perf_counter() - parsed) * 1000}
+        return spans, list(self.errors), timings, visitor.symbols
+
+    def warm_up(self):
+        with open(WARM_UP_PROGRAM) as f:
+            self.parse(f.read())
+
+
+def serve(requests, results):
+    latest = []
+    arrived = threading.Condition()
+
+    def read_requests():
+        while True:
+            try:
+                request = pickle.load(requests)
+            except (EOFError, pickle.UnpicklingError):
+                request = END_OF_REQUESTS
+            with arrived:
+                # the older requests are not worth parsing any more
+                latest[:] = [request]
+                arrived.notify()
+            if request == END_OF_REQUESTS:
+                return
+
+    threading.Thread(target=read_requests, daemon=True).start()
+    parser = ReusableParser()
+    parser.warm_up()
+    while True:
+        with arrived:
+            while not latest:
+                arrived.wait()
+            request = latest.pop()
+        if request == END_OF_REQUESTS:
+            return
+        version, text = request
+        try:
+            spans, errors, timings, symbols = parser.parse(text, cancelled=lambda: bool(latest))
+        except ParseCancelled:
+            continue
+        except Exception:
+            # the IDE keeps the old colours, the worker stays alive for the next request
+            traceback.print_exc()
+            spans, errors, timings, symbols = None, None, None, None
+        pickle.dump((version, spans, errors, timings, symbols), results)
+        results.flush()
+
+
+if __name__ == "__main__":
+    serve(sys.stdin.buffer, sys.stdout.buffer)
@@ -0,0 +1,116 @@
+''' Index of the functions, structs and struct fields declared in the code
+
+Built by PainterVisitor in the parse worker and sent to the IDE with the
+spans, every lookup of a name or a position is a dictionary or list index. '''
+
+FUNCTION = "function"
+STRUCT = "struct"
+FIELD = "field"
+NO_REFERENCES = ()
+
+
+class Symbol:
+    def __init__(self, kind, name, line, column, parent=None):
+        self.kind = kind
+        self.name = name
+        self.line = line
+        self.column = column
+        # the struct of a field
+        self.parent = parent
+
+    def key(self):
+        return (self.kind, self.parent, self.name)
+
+    def qualified_name(self):
+        return f"{self.parent}.{self.name}" if self.parent else self.name
+
+    def char_pos(self):
+        return f"{self.line}.{self.column}"
+
+    def __eq__(self, other):
+        return isinstance(other, Symbol) and (self.key(), self.line, self.column) == \
+            (other.key(), other.line, other.column)
+
+    def __hash__(self):
+        return hash(self.key())
+
+
+class SymbolIndex:
+
+    def __init__(self):
+        self.symbols = {}
+        # (begin column, end column, key of the declaration) of the names used on every line, index i is line i + 1
+        self.references = []
+
+    def declare(self, kind, token, parent=None):
+        symbol = Symbol(kind, token.text, token.line, token.column, parent)
+        # a redeclaration is a semantic error, the first one is where the compiler looks
+        self.symbols.setdefault(symbol.key(), symbol)
+
+    def refer(self, kind, token):
+        line = token.line
+        while len(self.references) < line:
+            self.references.append(NO_REFERENCES)
+        self.references[line - 1] += ((token.column, token.column + len(token.text), (kind, None, token.text)),)
+
+    def get(self, kind, name, parent=None):
+        return self.symbols.get((kind, parent, name))
+
+    def definition_at(self, line, column):
+        ''' Returns the declaration of the function or struct used at line.column, or None '''
+        if not 0 < line <= len(self.references):
+            return None
+        for begin, end, key in self.references[line - 1]:
+            if begin <= column <= end:
+                return self.symbols.get(key)
+        return None
+
+    def note_edit(self, first, old_last, new_last):
+        ''' The references on the following lines move with the text until the next parse '''
+        self.references[first - 1:old_last] = [NO_REFERENCES] * (new_last - first + 1)
+
+    def outline(self):
+        ''' Returns the functions and the structs ordered by line, with the fields of every struct '''
+        fields = {}
+        top_level = []
+        for symbol in self.symbols.values():
+            if symbol.kind == FIELD:
+                fields.setdefault(symbol.parent, []).append(symbol)
+            else:
+                top_level.append(symbol)
+        top_level.sort(key=lambda symbol: symbol.line)
+        return [(symbol, sorted(fields.get(symbol.name, []), key=lambda field: field.line)
+                 if symbol.kind == STRUCT else []) for symbol in top_level]
+
+    def find(self, query, limit=None):
+        ''' Returns the symbols whose qualified name contains the letters of query in order, best first '''
+        scored = []
+        for symbol in self.symbols.values():
+            score = fuzzy_score(query, symbol.qualified_name())
+            if score is not None:
+                scored.append((-score, symbol.line, symbol.qualified_name(), symbol))
+        scored.sort(key=lambda entry: entry[:3])
+        return [entry[3] for entry in scored[:limit]]
+
+
+def fuzzy_score(query, name):
+    ''' Higher for letters matched at the start, after a separator or right after each other, None if no match '''
+    query = query.lower()
+    lowered = name.lower()
+    boundaries = [i for i in range(len(name)) if i == 0 or name[i - 1] in "._" or name[i].isupper()]
+    score = 0
+    position = -1
+    for letter in query:
+        found = lowered.find(letter, position + 1)
+        if found < 0:
+            return None
+        if found != position + 1:
+            # a later start of a word is a better match than a letter in the middle of one
+            found = next((i for i in boundaries if i > position and lowered[i] == letter), found)
+        if found in boundaries:
+            score += 3
+        if found == position + 1:
+            score += 2
+        position = found
+    # shorter names are closer matches
+    return score * 100 - len(name)
@@ -0,0 +1,67 @@
+''' Run from the ide directory with: python -m unittest
+    Needs a display, the tests are skipped without one '''
+import tkinter
+import types
+import unittest
+
+from style import configure_styles
+from codeframe import CodeFrame
+from eventlog import EventLog
+from buffers import BufferTabs
+
+FIRST = "begin\n  int x = 1 ;\n  println x\nend\n"
+SECOND = "begin\n  skip\nend\n"
+
+
+class BufferTabsTest(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            self.root = tkinter.Tk()
+        except tkinter.TclError as e:
+            self.skipTest(f"no display: {e}")
+        configure_styles(self.root)
+        self.code_frame = CodeFrame(self.root)
+        self.code_frame.pack()
+        self.event_log = EventLog(self.root)
+        self.code_frame.link_event_log(self.event_log)
+        output = types.SimpleNamespace(snapshot=lambda: None, restore=lambda snapshot: None)
+        self.tabs = BufferTabs(self.root, self.code_frame, self.event_log, output)
+
+    def tearDown(self):
+        painter = self.code_frame.text.painter
+        painter.worker.stop()
+        painter.diagnostics.stop()
+        self.root.destroy()
+
+    def open(self, path, text):
+        buffer = self.tabs.open(path, text)
+        self.settle()
+        return buffer
+
+    def settle(self):
+        while self.code_frame.text.loading:
+            self.root.update()
+        self.root.update()
+
+    def shown_text(self):
+        return self.code_frame.text.get('1.0', 'end - 1c')
+
+    def test_switch_between_two_buffers(self):
+        first = self.open("first.wacc", FIRST)
+        second = self.open("second.wacc", SECOND)
+        self.assertEqual(self.shown_text(), SECOND)
+
+        self.tabs.show(first)
+        self.settle()
+        self.assertIs(self.tabs.active, first)
+        self.assertEqual(self.shown_text(), FIRST)
+
+        self.tabs.show(second)
+        self.settle()
+        self.assertEqual(self.shown_text(), SECOND)
+        self.assertEqual(first.text, FIRST)
+
+
+if __name__ == '__main__':
+    unittest.main()
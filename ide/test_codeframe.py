@@ -0,0 +1,29 @@
+''' Run from the ide directory with: python -m unittest '''
+import tkinter
+import unittest
+
+from codeframe import CodeText
+
+
+class CodeTextProxyTest(unittest.TestCase):
+    ''' The proxy of a CodeText on a bare Tcl interpreter, the widget behind it answers every command
+        with a fixed view, so no display is needed '''
+
+    def setUp(self):
+        self.text = CodeText.__new__(CodeText)
+        self.text.tk = tkinter.Tcl().tk
+        self.text._w = "code_text"
+        self.text._orig = "code_text_orig"
+        self.text.loading = False
+        self.text.tk.eval('proc code_text_orig {args} { return "0.25 0.75" }')
+        self.text.tk.createcommand(self.text._w, self.text._proxy)
+
+    def test_xview_without_arguments(self):
+        self.assertEqual(self.text.xview(), (0.25, 0.75))
+
+    def test_yview_without_arguments(self):
+        self.assertEqual(self.text.yview(), (0.25, 0.75))
+
+
+if __name__ == '__main__':
+    unittest.main()
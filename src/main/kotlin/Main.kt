@@ -1,48 +1,29 @@
-import antlr.WACCLexer
-import antlr.WACCParser
-import ast.ProgramAST
-import codegen.ProgramVisitor
-import codegen.WInstrToString.Companion.translateInstructions
-import codegen.InstructionEvaluation.Companion.evaluateInstructions
-import instructions.misc.DataDeclaration
-import org.antlr.v4.runtime.CharStreams
-import org.antlr.v4.runtime.CommonTokenStream
-import semantic.ASTProducer
-import symbolTable.ParentRefSymbolTable
-import syntax.SyntaxErrBuilderErrorListener
-import utils.ExitCode
-import utils.SemanticException
+import driver.BatchCompiler
+import driver.BenchmarkRunner
+import driver.CompilerDaemon
+import driver.WACCCompiler
 import java.io.File
+import java.nio.file.Path
 import kotlin.system.exitProcess
 
 fun main(args: Array<String>) {
     if (args.isEmpty()) {
-        throw IllegalArgumentException("Please provide filepath as argument.")
+        throw IllegalArgumentException("Please provide filepath as argument (or --batch to read them from stdin).")
     }
-    val file = File(args[0])
-
-    val input = CharStreams.fromFileName(file.absolutePath)
-
-    val lexer = WACCLexer(input)
-
-    val tokens = CommonTokenStream(lexer)
-
-    val parser = WACCParser(tokens)
-
-    // setting the only listeners to our custom listener
-    parser.removeErrorListeners()
-    parser.addErrorListener(SyntaxErrBuilderErrorListener(file))
-
-    val tree = parser.program()
-    val ast: ProgramAST
-    try {
-        ast = ASTProducer(ParentRefSymbolTable(file.absolutePath)).visit(tree) as ProgramAST
-    } catch (e: SemanticException) {
-        println(e.reason)
-        exitProcess(ExitCode.SEMANTIC_ERROR)
+    if (args[0] == CompilerDaemon.DAEMON_FLAG) {
+        if (args.size < 2) {
+            throw IllegalArgumentException("Please provide socket path for the compiler daemon.")
+        }
+        CompilerDaemon(Path.of(args[1])).serve()
+        return
+    }
+    if (args[0] == BatchCompiler.BATCH_FLAG) {
+        BatchCompiler().run()
+        return
+    }
+    if (args[0] == BenchmarkRunner.BENCH_FLAG) {
+        BenchmarkRunner().run()
+        return
     }
-    val instructions = ProgramVisitor(DataDeclaration()).visit(ast)
-    val optimised_instructions = evaluateInstructions(instructions)
-    val code = translateInstructions(optimised_instructions)
-    println(code)
-}
\ No newline at end of file
+    exitProcess(WACCCompiler.compile(File(args[0])))
+}
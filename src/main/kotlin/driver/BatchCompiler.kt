@@ -0,0 +1,31 @@
+package driver
+
+import java.io.File
+import java.io.PrintStream
+
+/**
+ * Compiles many files in a single JVM. Source paths are read from stdin, one per line.
+ * For every file a frame is written to stdout:
+ *
+ *     "<exit code>\t<output size in bytes>\n<output>"
+ *
+ * so the caller can tell the outputs apart without any escaping.
+ */
+class BatchCompiler(private val out: PrintStream = System.out) {
+
+    fun run() {
+        System.`in`.bufferedReader().forEachLine { path ->
+            if (path.isNotBlank()) {
+                val result = WACCCompiler.compileCapturingOutput(File(path))
+                val output = result.output.toByteArray()
+                out.print("${result.exitCode}\t${output.size}\n")
+                out.write(output)
+                out.flush()
+            }
+        }
+    }
+
+    companion object {
+        const val BATCH_FLAG = "--batch"
+    }
+}
@@ -0,0 +1,42 @@
+package driver
+
+import java.io.File
+import java.io.PrintStream
+import java.util.Locale
+
+/**
+ * Compiles the files whose paths are read from stdin (one per line, repeated paths are compiled again)
+ * and prints a JSON line per compilation with the exit code and the milliseconds spent in every phase.
+ * The generated code itself is thrown away.
+ */
+class BenchmarkRunner(private val out: PrintStream = System.out) {
+
+    fun run() {
+        System.`in`.bufferedReader().forEachLine { path ->
+            if (path.isNotBlank()) {
+                val phaseTimes = mutableMapOf<String, Long>()
+                val start = System.nanoTime()
+                val result = WACCCompiler.compileCapturingOutput(File(path), phaseTimes)
+                val total = System.nanoTime() - start
+                val phases = phaseTimes.entries.joinToString(", ") { (phase, nanos) -> "\"$phase\": ${millis(nanos)}" }
+                out.println("{\"file\": \"${escape(path)}\", \"exit_code\": ${result.exitCode}, " +
+                        "\"total\": ${millis(total)}, \"phases\": {$phases}}")
+                out.flush()
+            }
+        }
+    }
+
+    private fun millis(nanos: Long): String {
+        // JSON needs a decimal point regardless of the default locale
+        return String.format(Locale.ROOT, "%.3f", nanos / NANOS_IN_MILLI)
+    }
+
+    private fun escape(path: String): String {
+        return path.replace("\\", "\\\\").replace("\"", "\\\"")
+    }
+
+    companion object {
+        const val BENCH_FLAG = "--bench"
+        private const val NANOS_IN_MILLI = 1_000_000.0
+    }
+}
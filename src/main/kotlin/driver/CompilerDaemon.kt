@@ -0,0 +1,102 @@
+package driver
+
+import utils.ExitCode
+import java.io.File
+import java.net.StandardProtocolFamily
+import java.net.UnixDomainSocketAddress
+import java.nio.channels.Channels
+import java.nio.channels.ServerSocketChannel
+import java.nio.channels.SocketChannel
+import java.nio.file.Files
+import java.nio.file.Path
+import kotlin.system.exitProcess
+
+/**
+ * Long-lived compiler process which keeps the JVM, loaded classes and ANTLR caches warm.
+ * Listens on a Unix domain socket and serves one job per connection.
+ *
+ * Request:  a single line of tab separated fields, the first one being the command
+ *           e.g. "compile\t/absolute/path/to/file.wacc\n", "check\t/absolute/path/to/file.wacc\n",
+ *           "ping\n" or "shutdown\n" ("check" stops after the semantic analysis, without code generation)
+ * Response: the exit code on the first line followed by everything the compiler printed
+ */
+class CompilerDaemon(private val socketPath: Path) {
+
+    private val jarFile: File? = CompilerDaemon::class.java.protectionDomain.codeSource?.location
+        ?.let { File(it.toURI()) }
+    private val jarLastModified: Long = jarFile?.lastModified() ?: 0L
+
+    fun serve() {
+        Files.deleteIfExists(socketPath)
+        ServerSocketChannel.open(StandardProtocolFamily.UNIX).use { server ->
+            server.bind(UnixDomainSocketAddress.of(socketPath))
+            startWatchdog()
+            while (true) {
+                // a broken request or a client gone before the reply must not stop the daemon
+                try {
+                    server.accept().use { handle(it) }
+                } catch (e: Exception) {
+                    e.printStackTrace()
+                }
+            }
+        }
+    }
+
+    private fun handle(client: SocketChannel) {
+        val request = Channels.newInputStream(client).bufferedReader().readLine() ?: return
+        val fields = request.split(FIELD_SEPARATOR)
+        val response = when (fields[0]) {
+            COMPILE_COMMAND -> withPath(fields) { WACCCompiler.compileCapturingOutput(it) }
+            CHECK_COMMAND -> withPath(fields) { WACCCompiler.checkCapturingOutput(it) }
+            PING_COMMAND -> "${ExitCode.SUCCESS}\n"
+            SHUTDOWN_COMMAND -> shutdown()
+            else -> "${WACCCompiler.INTERNAL_ERROR}\nUnknown daemon command: ${fields[0]}\n"
+        }
+        val output = Channels.newOutputStream(client)
+        output.write(response.toByteArray())
+        output.flush()
+    }
+
+    /**
+     * Runs the job on the file named by the second field of the request and formats its response
+     */
+    private fun withPath(fields: List<String>, job: (File) -> CompilationResult): String {
+        if (fields.size < 2 || fields[1].isEmpty()) {
+            return "${WACCCompiler.INTERNAL_ERROR}\nMissing path\n"
+        }
+        return job(File(fields[1])).let { "${it.exitCode}\n${it.output}" }
+    }
+
+    private fun shutdown(): Nothing {
+        Files.deleteIfExists(socketPath)
+        exitProcess(0)
+    }
+
+    /**
+     * Terminates the daemon when its socket is removed (e.g. by 'make clean')
+     * or when the jar it was loaded from is rebuilt, so stale code is never served
+     */
+    private fun startWatchdog() {
+        val watchdog = Thread {
+            while (true) {
+                Thread.sleep(WATCHDOG_PERIOD_MS)
+                val jarRebuilt = jarFile != null && jarFile.lastModified() != jarLastModified
+                if (!Files.exists(socketPath) || jarRebuilt) {
+                    shutdown()
+                }
+            }
+        }
+        watchdog.isDaemon = true
+        watchdog.start()
+    }
+
+    companion object {
+        const val DAEMON_FLAG = "--daemon"
+        const val COMPILE_COMMAND = "compile"
+        const val CHECK_COMMAND = "check"
+        const val SHUTDOWN_COMMAND = "shutdown"
+        const val PING_COMMAND = "ping"
+        private const val FIELD_SEPARATOR = "\t"
+        private const val WATCHDOG_PERIOD_MS = 2000L
+    }
+}
@@ -0,0 +1,149 @@
+package driver
+
+import antlr.WACCLexer
+import antlr.WACCParser
+import ast.ProgramAST
+import codegen.InstructionEvaluation.Companion.evaluateInstructions
+import codegen.ProgramVisitor
+import codegen.WInstrToString.Companion.translateInstructions
+import instructions.misc.DataDeclaration
+import org.antlr.v4.runtime.CharStreams
+import org.antlr.v4.runtime.CommonTokenStream
+import semantic.ASTProducer
+import symbolTable.ParentRefSymbolTable
+import syntax.SyntaxErrBuilderErrorListener
+import utils.ExitCode
+import utils.SemanticException
+import utils.SyntaxException
+import java.io.ByteArrayOutputStream
+import java.io.File
+import java.io.PrintStream
+
+data class CompilationResult(val exitCode: Int, val output: String)
+
+class WACCCompiler {
+
+    companion object {
+
+        const val INTERNAL_ERROR = 1
+
+        const val LEX_PHASE = "lex"
+        const val PARSE_PHASE = "parse"
+        const val AST_PHASE = "ast"
+        const val CODEGEN_PHASE = "codegen"
+        const val PEEPHOLE_PHASE = "peephole"
+        const val EMIT_PHASE = "emit"
+
+        /**
+         * Runs the whole compilation pipeline on a single WACC source file.
+         * The generated assembly or the error messages are printed to System.out,
+         * so the caller is responsible for redirecting it if the output has to be captured.
+         * @param file is the WACC source file to be compiled
+         * @param phaseTimes receives the time in nanoseconds spent in every phase which was reached
+         * @return the exit code of the compilation (0, 100 or 200)
+         */
+        fun compile(file: File, phaseTimes: MutableMap<String, Long> = mutableMapOf()): Int {
+            val ast: ProgramAST
+            try {
+                ast = analyse(file, phaseTimes)
+            } catch (e: SyntaxException) {
+                return ExitCode.SYNTAX_ERROR
+            } catch (e: SemanticException) {
+                println(e.reason)
+                return ExitCode.SEMANTIC_ERROR
+            }
+            val instructions = timed(phaseTimes, CODEGEN_PHASE) { ProgramVisitor(DataDeclaration()).visit(ast) }
+            val optimisedInstructions = timed(phaseTimes, PEEPHOLE_PHASE) { evaluateInstructions(instructions) }
+            timed(phaseTimes, EMIT_PHASE) { println(translateInstructions(optimisedInstructions)) }
+            return ExitCode.SUCCESS
+        }
+
+        /**
+         * Same as compile() but stops after the semantic checks, nothing is printed for a valid program.
+         * Used by the IDE to report the semantic errors while the code is being edited.
+         * @return the exit code of the compilation (0, 100 or 200)
+         */
+        fun check(file: File, phaseTimes: MutableMap<String, Long> = mutableMapOf()): Int {
+            try {
+                analyse(file, phaseTimes)
+            } catch (e: SyntaxException) {
+                return ExitCode.SYNTAX_ERROR
+            } catch (e: SemanticException) {
+                println(e.reason)
+                return ExitCode.SEMANTIC_ERROR
+            }
+            return ExitCode.SUCCESS
+        }
+
+        /**
+         * Lexes and parses the file and produces its AST, checking the semantics on the way
+         * @throws SyntaxException after the syntax error message is printed
+         * @throws SemanticException carrying the semantic error message
+         */
+        private fun analyse(file: File, phaseTimes: MutableMap<String, Long>): ProgramAST {
+            val input = CharStreams.fromFileName(file.absolutePath)
+
+            val lexer = WACCLexer(input)
+
+            // the tokens are fetched eagerly so that lexing is measured separately from parsing
+            val tokens = timed(phaseTimes, LEX_PHASE) { CommonTokenStream(lexer).also { it.fill() } }
+
+            val parser = WACCParser(tokens)
+
+            // setting the only listeners to our custom listener
+            parser.removeErrorListeners()
+            parser.addErrorListener(SyntaxErrBuilderErrorListener(file))
+
+            val tree = timed(phaseTimes, PARSE_PHASE) { parser.program() }
+            return timed(phaseTimes, AST_PHASE) {
+                ASTProducer(ParentRefSymbolTable(file.absolutePath)).visit(tree) as ProgramAST
+            }
+        }
+
+        /**
+         * Records the duration of the block even if it is left with an exception
+         */
+        private inline fun <T> timed(phaseTimes: MutableMap<String, Long>, phase: String, block: () -> T): T {
+            val start = System.nanoTime()
+            try {
+                return block.invoke()
+            } finally {
+                phaseTimes[phase] = System.nanoTime() - start
+            }
+        }
+
+        /**
+         * Same as compile() but System.out is redirected into a buffer for the time of the compilation.
+         * Unexpected exceptions and errors (e.g. a StackOverflowError on deeply nested code) are reported
+         * on stderr and result in INTERNAL_ERROR exit code, so a long-lived process can carry on with the next file.
+         */
+        fun compileCapturingOutput(
+            file: File,
+            phaseTimes: MutableMap<String, Long> = mutableMapOf()
+        ): CompilationResult {
+            return capturingOutput { compile(file, phaseTimes) }
+        }
+
+        /**
+         * Same as check() with the output captured like in compileCapturingOutput()
+         */
+        fun checkCapturingOutput(file: File): CompilationResult {
+            return capturingOutput { check(file) }
+        }
+
+        private fun capturingOutput(compilation: () -> Int): CompilationResult {
+            val buffer = ByteArrayOutputStream()
+            val stdout = System.out
+            System.setOut(PrintStream(buffer, true))
+            val exitCode = try {
+                compilation.invoke()
+            } catch (e: Throwable) {
+                e.printStackTrace()
+                INTERNAL_ERROR
+            } finally {
+                System.setOut(stdout)
+            }
+            return CompilationResult(exitCode, buffer.toString())
+        }
+    }
+}
@@ -4,10 +4,9 @@ import antlr.WACCParser
 import ast.Stat
 import ast.statement.*
 import symbolTable.SymbolTable
-import utils.ExitCode
 import utils.PositionedError
 import utils.SyntaxErrorMessageBuilder
-import kotlin.system.exitProcess
+import utils.SyntaxException
 
 class SyntaxChecker {
     companion object {
@@ -23,7 +22,7 @@ class SyntaxChecker {
                     .setLineTextFromSrcFile(st.srcFilePath)
                     .appendCustomErrorMessage("Attempted to parse a very big int ${ctx.text}!")
                     .buildAndPrint()
-                exitProcess(ExitCode.SYNTAX_ERROR)
+                throw SyntaxException("Attempted to parse a very big int ${ctx.text}!")
             }
         }
 
@@ -52,13 +51,13 @@ class SyntaxChecker {
                 return hasReturn(stat.second, true)
             }
             println("Should not have return before another non-return statement.")
-            exitProcess(ExitCode.SYNTAX_ERROR)
+            throw SyntaxException("Should not have return before another non-return statement.")
         }
 
         fun checkFunctionHavingReturn(body: Stat, identifier: String) {
             if (!hasReturn(body, true)) {
                 println("Function $identifier does not return on every branch.")
-                exitProcess(ExitCode.SYNTAX_ERROR)
+                throw SyntaxException("Function $identifier does not return on every branch.")
             }
         }
     }
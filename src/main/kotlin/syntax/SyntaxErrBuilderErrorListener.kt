@@ -3,10 +3,9 @@ package syntax
 import org.antlr.v4.runtime.BaseErrorListener
 import org.antlr.v4.runtime.RecognitionException
 import org.antlr.v4.runtime.Recognizer
-import utils.ExitCode
 import utils.SyntaxErrorMessageBuilder
+import utils.SyntaxException
 import java.io.File
-import kotlin.system.exitProcess
 
 class SyntaxErrBuilderErrorListener(private val sourceFile: File) : BaseErrorListener() {
     override fun syntaxError(
@@ -22,6 +21,6 @@ class SyntaxErrBuilderErrorListener(private val sourceFile: File) : BaseErrorLis
             .setLineTextFromSrcFile(sourceFile.absolutePath)
             .appendCustomErrorMessage(msg ?: "Null message")
             .buildAndPrint()
-        exitProcess(ExitCode.SYNTAX_ERROR)
+        throw SyntaxException(msg ?: "Null message")
     }
 }
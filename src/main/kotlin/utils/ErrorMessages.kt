@@ -57,4 +57,13 @@ data class ErrorMessage(
 class SemanticException(val reason: String) : Exception() {
     override val message: String
         get() = "Semantic error!\n$reason"
-}
\ No newline at end of file
+}
+
+/**
+ * Thrown when a syntax error is detected after the error message is printed.
+ * Allows the caller to decide how to terminate (exit process or reply to a daemon client)
+ */
+class SyntaxException(val reason: String = "") : Exception() {
+    override val message: String
+        get() = "Syntax error!\n$reason"
+}
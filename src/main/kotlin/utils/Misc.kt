@@ -2,6 +2,7 @@ package utils
 
 class ExitCode(val code: Int) {
     companion object {
+        const val SUCCESS: Int = 0
         const val SYNTAX_ERROR: Int = 100
         const val SEMANTIC_ERROR: Int = 200
     }
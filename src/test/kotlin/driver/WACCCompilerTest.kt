@@ -0,0 +1,53 @@
+package driver
+
+import org.junit.Test
+import utils.ExitCode
+import java.io.File
+import kotlin.test.assertEquals
+
+class WACCCompilerTest {
+
+    private val samples = "wacc_test/sample_programs"
+
+    @Test
+    fun validProgramCompilesSuccessfully() {
+        val exitCode = WACCCompiler.compile(File("$samples/valid/basic/skip/skip.wacc"))
+        assertEquals(ExitCode.SUCCESS, exitCode)
+    }
+
+    @Test
+    fun syntaxErrorIsReportedWithoutExitingTheProcess() {
+        val exitCode = WACCCompiler.compile(File("$samples/invalid/syntaxErr/basic/bgnErr.wacc"))
+        assertEquals(ExitCode.SYNTAX_ERROR, exitCode)
+    }
+
+    @Test
+    fun semanticErrorIsReportedWithoutExitingTheProcess() {
+        val exitCode = WACCCompiler.compile(File("$samples/invalid/semanticErr/exit/exitNonInt.wacc"))
+        assertEquals(ExitCode.SEMANTIC_ERROR, exitCode)
+    }
+
+    @Test
+    fun consecutiveCompilationsDoNotAffectEachOther() {
+        repeat(2) {
+            assertEquals(ExitCode.SEMANTIC_ERROR,
+                WACCCompiler.compile(File("$samples/invalid/semanticErr/exit/exitNonInt.wacc")))
+            assertEquals(ExitCode.SUCCESS,
+                WACCCompiler.compile(File("$samples/valid/basic/skip/skip.wacc")))
+        }
+    }
+
+    @Test
+    fun stackOverflowIsReportedAsInternalErrorWithoutExitingTheProcess() {
+        val nested = File.createTempFile("nested", ".wacc")
+        try {
+            val depth = 200000
+            nested.writeText("begin\n  int x = ${"(".repeat(depth)}1${")".repeat(depth)}\nend\n")
+            assertEquals(WACCCompiler.INTERNAL_ERROR, WACCCompiler.compileCapturingOutput(nested).exitCode)
+            assertEquals(ExitCode.SUCCESS,
+                WACCCompiler.compileCapturingOutput(File("$samples/valid/basic/skip/skip.wacc")).exitCode)
+        } finally {
+            nested.delete()
+        }
+    }
+}
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+'''
+Two level cache of assembling and emulating the compiled programs.
+
+The first level maps the hash of the assembly (and the gcc flags) to the
+binary produced by arm-linux-gnueabi-gcc, so an unchanged .s file is never
+assembled twice. The second level maps the hash of the binary and the stdin to
+the output and exit code captured from qemu-arm, so an unchanged program is
+not emulated again either.
+
+The binaries are kept as files in the cache directory and indexed by an SQLite
+database next to them. Once the cache grows over its size limit the least
+recently used entries are evicted.
+
+Can also be used from the shell:
+    ./emulationcache.py [-p input] compiled_code/sample_programs/valid/basic/skip/skip.s
+'''
+import os, sys, argparse, hashlib, shutil, sqlite3, tempfile, time
+
+from harness import WACC_TEST_DIR, GCC_FLAGS, assemble, emulate, formatEmulatedOutput
+
+EMULATION_CACHE_DIR = os.path.join(WACC_TEST_DIR, "emulation_cache")
+INDEX_FILE = "index.sqlite3"
+BINARIES_DIR = "binaries"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# entries used this recently are never evicted, another worker may be about to run them
+EVICTION_GRACE = 60  # seconds
+DB_TIMEOUT = 60  # seconds
+# exit codes of 'timeout' and of undecodable output, which may not happen on the next run
+UNCACHEABLE_EXIT_CODES = [124, -1]
+
+
+def hashParts(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else part.encode('utf-8'))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class CachedBinary:
+    ''' Path of an assembled program together with the hash of its content '''
+
+    def __init__(self, path, digest):
+        self.path = path
+        self.digest = digest
+
+
+class EmulationCache:
+
+    def __init__(self, cache_dir: str = EMULATION_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(cache_dir, BINARIES_DIR), exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(cache_dir, INDEX_FILE), timeout=DB_TIMEOUT)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS binaries ("
+                                    "key TEXT PRIMARY KEY, digest TEXT, size INTEGER, last_used REAL)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS runs ("
+                                    "key TEXT PRIMARY KEY, output TEXT, exit_code INTEGER, size INTEGER, "
+                                    "last_used REAL)")
+
+    def binaryPath(self, key: str) -> str:
+        return os.path.join(self.cache_dir, BINARIES_DIR, key)
+
+    def assemble(self, assembly_path: str):
+        ''' Returns the CachedBinary of the assembly file, None if gcc rejected it '''
+        with open(assembly_path, 'rb') as f:
+            key = hashParts(f.read(), *GCC_FLAGS)
+
+        row = self.connection.execute("SELECT digest FROM binaries WHERE key = ?", (key,)).fetchone()
+        if row is not None and os.path.isfile(self.binaryPath(key)):
+            self.touch("binaries", key)
+            return CachedBinary(self.binaryPath(key), row[0])
+
+        # assemble next to the final location and move it there atomically
+        fd, temp_path = tempfile.mkstemp(dir=os.path.join(self.cache_dir, BINARIES_DIR), prefix=".gcc-")
+        os.close(fd)
+        try:
+            if assemble(assembly_path, temp_path) != 0:
+                return None
+            with open(temp_path, 'rb') as f:
+                digest = hashParts(f.read())
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, self.binaryPath(key))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO binaries VALUES (?, ?, ?, ?)",
+                                    (key, digest, size, time.time()))
+        self.evict()
+        return CachedBinary(self.binaryPath(key), digest)
+
+    def lookup(self, binary: CachedBinary, stdin: str = ""):
+        ''' Returns the (output, exit code) recorded for the binary run on the stdin or None '''
+        key = hashParts(binary.digest, stdin)
+        row = self.connection.execute("SELECT output, exit_code FROM runs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.touch("runs", key)
+        return row[0], row[1]
+
+    def store(self, binary: CachedBinary, stdin: str, output: str, exit_code: int):
+        if exit_code in UNCACHEABLE_EXIT_CODES:
+            return
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)",
+                                    (hashParts(binary.digest, stdin), output, exit_code,
+                                     len(output.encode('utf-8')), time.time()))
+        self.evict()
+
+    def emulate(self, binary: CachedBinary, stdin: str = ""):
+        ''' Returns the output and the exit code of the binary run on the stdin '''
+        cached = self.lookup(binary, stdin)
+        if cached is not None:
+            return cached
+        output, exit_code = emulate(binary.path, stdin)
+        self.store(binary, stdin, output, exit_code)
+        return output, exit_code
+
+    def run(self, assembly_path: str, stdin: str = ""):
+        ''' Assembles and emulates the program, (output, exit code) or None if it could not be assembled '''
+        binary = self.assemble(assembly_path)
+        return None if binary is None else self.emulate(binary, stdin)
+
+    def touch(self, table: str, key: str):
+        with self.connection:
+            self.connection.execute(f"UPDATE {table} SET last_used = ? WHERE key = ?", (time.time(), key))
+
+    def size(self) -> int:
+        return sum(self.connection.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+                   for table in ("binaries", "runs"))
+
+    def evict(self):
+        ''' Removes the least recently used entries until the cache fits into its size limit '''
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        entries = self.connection.execute(
+            "SELECT 'binaries', key, size, last_used FROM binaries UNION ALL "
+            "SELECT 'runs', key, size, last_used FROM runs ORDER BY last_used").fetchall()
+        now = time.time()
+        with self.connection:
+            for table, key, size, last_used in entries:
+                if excess <= 0 or now - last_used < EVICTION_GRACE:
+                    break
+                self.connection.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+                if table == "binaries" and os.path.exists(self.binaryPath(key)):
+                    os.remove(self.binaryPath(key))
+                excess -= size
+
+    def clear(self):
+        self.connection.close()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def close(self):
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Prints the (cached) output of an emulated assembly file')
+    parser.add_argument('assembly_file', nargs='?', help='.s file produced by the compiler')
+    parser.add_argument('-p', default="", type=str, help='input into the program')
+    parser.add_argument('--clear', action="store_true", help='remove every cached binary and output')
+    options = parser.parse_args()
+
+    if options.clear:
+        EmulationCache().clear()
+        sys.exit(0)
+    if options.assembly_file is None:
+        parser.error("the assembly file is required")
+
+    result = EmulationCache().run(options.assembly_file, options.p)
+    if result is None:
+        print(f"Error: {options.assembly_file} could not be assembled")
+        sys.exit(1)
+    print(formatEmulatedOutput(*result), end="")
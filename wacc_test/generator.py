@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+'''
+Generator of large valid WACC programs used to find out how the compiler, the
+tests and the IDE scale.
+
+Every generated construct is paired with a small Python evaluator, the
+program is executed while it is generated, so the '# Output:' and '# Exit:'
+headers which 'testOutputOne -e' and 'testParallel -e' expect are always right.
+All int values stay far below the overflow limit and every division is by a non
+zero literal, so the programs never hit a runtime error.
+
+    ./generator.py -o generated_programs --functions 500 --depth 50 --seed 1
+    ./testParallel -e 'generated_programs/*.wacc'
+'''
+import os, sys, argparse, random
+
+from harness import WACC_TEST_DIR, EXTENSION_OUTPUT_SPLIT, EXIT_CODE_REGEX
+
+GENERATED_DIR = os.path.join(WACC_TEST_DIR, "generated_programs")
+INDENT = "  "
+# every int variable holds a value in (-VALUE_BOUND, VALUE_BOUND)
+VALUE_BOUND = 1000
+# bound of the subexpressions, (9 * EXPR_BOUND) still fits into a signed 32 bit int
+EXPR_BOUND = 2 ** 27
+MAX_LITERAL = 100
+MAX_FACTOR = 9
+# while loops run more than once only near the top, so the run time stays linear in the depth
+REPEATED_LOOP_LEVELS = 3
+WORDS = ["alpha", "beta", "gamma", "delta", "omega", "wacc", "compiler", "arm", "stack", "heap"]
+
+
+class GeneratorConfig:
+    ''' Sizes of the generated program, every count scales one construct '''
+
+    def __init__(self, functions=10, depth=5, expr_depth=2, structs=2, strings=10, array_size=10, seed=0):
+        self.functions = functions
+        self.depth = depth
+        self.expr_depth = expr_depth
+        self.structs = structs
+        self.strings = strings
+        self.array_size = array_size
+        self.seed = seed
+
+
+# int division and remainder of ARM (truncate towards zero)
+def truncDiv(a: int, b: int) -> int:
+    quotient = abs(a) // abs(b)
+    return quotient if (a < 0) == (b < 0) else -quotient
+
+def truncMod(a: int, b: int) -> int:
+    return a - b * truncDiv(a, b)
+
+
+class Expr:
+    ''' Text of an expression, the bound of its absolute value and its evaluator '''
+
+    def __init__(self, text, bound, evaluate):
+        self.text = text
+        self.bound = bound
+        self.evaluate = evaluate
+
+
+class Stat:
+    ''' Text of a statement (without the trailing ';') and its executor '''
+
+    def __init__(self, text, execute):
+        self.text = text
+        self.execute = execute
+
+
+class Function:
+
+    def __init__(self, name, params, body, result):
+        self.name = name
+        self.params = params
+        self.body = body
+        self.result = result
+
+    def call(self, args, out):
+        env = dict(zip(self.params, args))
+        for stat in self.body:
+            stat.execute(env, out)
+        return self.result.evaluate(env)
+
+
+class ProgramGenerator:
+
+    def __init__(self, config: GeneratorConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.functions = []
+        self.struct_decls = []
+        self.names = 0
+
+    def fresh(self, prefix: str) -> str:
+        self.names += 1
+        return f"{prefix}{self.names}"
+
+    # ---------------------------------------------------------------- expressions
+
+    def literal(self) -> Expr:
+        value = self.rng.randrange(MAX_LITERAL)
+        return Expr(str(value), value, lambda env: value)
+
+    def variable(self, name: str) -> Expr:
+        return Expr(name, VALUE_BOUND - 1, lambda env: env[name])
+
+    def reduce(self, expr: Expr) -> Expr:
+        ''' Brings the expression back into (-VALUE_BOUND, VALUE_BOUND) if it could be outside '''
+        if expr.bound < VALUE_BOUND:
+            return expr
+        evaluate = expr.evaluate
+        return Expr(f"({expr.text} % {VALUE_BOUND})", VALUE_BOUND - 1,
+                    lambda env: truncMod(evaluate(env), VALUE_BOUND))
+
+    def intExpr(self, depth: int, scope: list) -> Expr:
+        if depth <= 0:
+            if scope and self.rng.random() < 0.6:
+                return self.variable(self.rng.choice(scope))
+            return self.literal()
+
+        # the left operand always reaches the full depth, the right one is shallower
+        left = self.intExpr(depth - 1, scope)
+        if left.bound > EXPR_BOUND // MAX_FACTOR:
+            left = self.reduce(left)
+        left_eval = left.evaluate
+        op = self.rng.choice("+-*/%")
+        if op in "+-":
+            right = self.intExpr(self.rng.randrange(depth), scope)
+            if right.bound > EXPR_BOUND // MAX_FACTOR:
+                right = self.reduce(right)
+            right_eval = right.evaluate
+            bound = left.bound + right.bound
+            if op == "+":
+                evaluate = lambda env: left_eval(env) + right_eval(env)
+            else:
+                evaluate = lambda env: left_eval(env) - right_eval(env)
+            return Expr(f"({left.text} {op} {right.text})", bound, evaluate)
+
+        # the right operand of '*', '/' and '%' is a small non zero literal
+        factor = self.rng.randint(1, MAX_FACTOR)
+        if op == "*":
+            bound, evaluate = left.bound * factor, lambda env: left_eval(env) * factor
+        elif op == "/":
+            bound, evaluate = left.bound, lambda env: truncDiv(left_eval(env), factor)
+        else:
+            bound, evaluate = factor - 1, lambda env: truncMod(left_eval(env), factor)
+        return Expr(f"({left.text} {op} {factor})", bound, evaluate)
+
+    def boolExpr(self, depth: int, scope: list) -> Expr:
+        if depth <= 0:
+            value = self.rng.random() < 0.5
+            return Expr("true" if value else "false", 1, lambda env: value)
+
+        kind = self.rng.choice(["compare", "compare", "not", "and", "or"])
+        if kind == "compare":
+            left, right = self.intExpr(depth - 1, scope), self.intExpr(self.rng.randrange(depth), scope)
+            left_eval, right_eval = left.evaluate, right.evaluate
+            op = self.rng.choice(["<", "<=", ">", ">=", "==", "!="])
+            compare = {"<": int.__lt__, "<=": int.__le__, ">": int.__gt__,
+                       ">=": int.__ge__, "==": int.__eq__, "!=": int.__ne__}[op]
+            return Expr(f"({left.text} {op} {right.text})", 1,
+                        lambda env: compare(left_eval(env), right_eval(env)))
+        if kind == "not":
+            operand = self.boolExpr(depth - 1, scope)
+            operand_eval = operand.evaluate
+            return Expr(f"!({operand.text})", 1, lambda env: not operand_eval(env))
+
+        left, right = self.boolExpr(depth - 1, scope), self.boolExpr(self.rng.randrange(depth), scope)
+        left_eval, right_eval = left.evaluate, right.evaluate
+        if kind == "and":
+            return Expr(f"({left.text} && {right.text})", 1, lambda env: left_eval(env) and right_eval(env))
+        return Expr(f"({left.text} || {right.text})", 1, lambda env: left_eval(env) or right_eval(env))
+
+    # ----------------------------------------------------------------- statements
+
+    def declare(self, scope: list, expr: Expr) -> Stat:
+        name = self.fresh("v")
+        expr = self.reduce(expr)
+        evaluate = expr.evaluate
+        scope.append(name)
+
+        def execute(env, out):
+            env[name] = evaluate(env)
+        return Stat(f"int {name} = {expr.text}", execute)
+
+    def assign(self, name: str, expr: Expr) -> Stat:
+        expr = self.reduce(expr)
+        evaluate = expr.evaluate
+
+        def execute(env, out):
+            env[name] = evaluate(env)
+        return Stat(f"{name} = {expr.text}", execute)
+
+    def println(self, expr: Expr, show=str) -> Stat:
+        evaluate = expr.evaluate
+        return Stat(f"println {expr.text}", lambda env, out: out.append(f"{show(evaluate(env))}\n"))
+
+    def printlnBool(self, expr: Expr) -> Stat:
+        return self.println(expr, lambda value: "true" if value else "false")
+
+    def call(self, scope: list, callee: Function) -> Stat:
+        name = self.fresh("v")
+        args = [self.reduce(self.intExpr(self.config.expr_depth, scope)) for _ in callee.params]
+        evaluators = [arg.evaluate for arg in args]
+        scope.append(name)
+
+        def execute(env, out):
+            env[name] = callee.call([evaluate(env) for evaluate in evaluators], out)
+        return Stat(f"int {name} = call {callee.name}({', '.join(arg.text for arg in args)})", execute)
+
+    def simpleStat(self, scope: list, callees: list) -> Stat:
+        expr_depth = self.config.expr_depth
+        kind = self.rng.choice(["declare", "assign", "print", "printBool", "call"])
+        if kind == "assign" and scope:
+            return self.assign(self.rng.choice(scope), self.intExpr(expr_depth, scope))
+        if kind == "print":
+            return self.println(self.intExpr(expr_depth, scope))
+        if kind == "printBool":
+            return self.printlnBool(self.boolExpr(expr_depth, scope))
+        if kind == "call" and callees:
+            return self.call(scope, self.rng.choice(callees))
+        return self.declare(scope, self.intExpr(expr_depth, scope))
+
+    def block(self, level: int, scope: list, callees: list, nested: bool = True) -> list:
+        ''' A few simple statements and, above the configured depth, one nested statement '''
+        scope = list(scope)
+        stats = [self.simpleStat(scope, callees) for _ in range(self.rng.randint(1, 2))]
+        if nested and level < self.config.depth:
+            stats.append(self.nestedStat(level, scope, callees))
+        return stats
+
+    def nestedStat(self, level: int, scope: list, callees: list) -> Stat:
+        kind = self.rng.choice(["if", "while", "begin"])
+        indent, outer = INDENT * (level + 2), INDENT * (level + 1)
+        if kind == "if":
+            cond = self.boolExpr(self.config.expr_depth, scope)
+            cond_eval = cond.evaluate
+            deep = self.block(level + 1, scope, callees)
+            shallow = self.block(level + 1, scope, callees, nested=False)
+            then_block, else_block = (deep, shallow) if self.rng.random() < 0.5 else (shallow, deep)
+
+            def execute(env, out):
+                for stat in then_block if cond_eval(env) else else_block:
+                    stat.execute(env, out)
+            text = (f"if {cond.text} then\n{joinStats(then_block, indent)}\n"
+                    f"{outer}else\n{joinStats(else_block, indent)}\n{outer}fi")
+            return Stat(text, execute)
+
+        if kind == "while":
+            counter = self.fresh("i")
+            times = 2 if level < REPEATED_LOOP_LEVELS else 1
+            # the counter is not in scope, so the body never assigns it
+            body = self.block(level + 1, scope, callees)
+            body.append(self.assign(counter, Expr(f"{counter} + 1", VALUE_BOUND - 1,
+                                                  lambda env: env[counter] + 1)))
+
+            def execute(env, out):
+                env[counter] = 0
+                while env[counter] < times:
+                    for stat in body:
+                        stat.execute(env, out)
+            text = (f"int {counter} = 0 ;\n{outer}while {counter} < {times} do\n"
+                    f"{joinStats(body, indent)}\n{outer}done")
+            return Stat(text, execute)
+
+        body = self.block(level + 1, scope, callees)
+
+        def execute(env, out):
+            for stat in body:
+                stat.execute(env, out)
+        return Stat(f"begin\n{joinStats(body, indent)}\n{outer}end", execute)
+
+    # ---------------------------------------------------------- top level units
+
+    def function(self, index: int) -> str:
+        params = ["a", "b"]
+        scope = list(params)
+        # only earlier functions are called, so there is no recursion
+        callees = [self.rng.choice(self.functions)] if self.functions else []
+        body = [self.simpleStat(scope, callees) for _ in range(self.rng.randint(1, 3))]
+        result = self.reduce(self.intExpr(self.config.expr_depth, scope))
+        function = Function(f"f{index}", params, body, result)
+        self.functions.append(function)
+        stats = joinStats(body + [Stat(f"return {result.text}", None)], INDENT * 2)
+        return f"{INDENT}int {function.name}(int a, int b) is\n{stats}\n{INDENT}end"
+
+    def struct(self, index: int, scope: list) -> list:
+        struct_name, var = f"Record{index}", self.fresh("r")
+        self.struct_decls.append(f"{INDENT}struct {struct_name} begin\n"
+                                 f"{INDENT * 2}int count ;\n{INDENT * 2}bool flag ;\n{INDENT * 2}string label ;\n"
+                                 f"{INDENT}end")
+        label = self.stringLiteral()
+        count, flag = f"{var}.count", f"{var}.flag"
+        stats = [Stat(f"struct {struct_name} {var}", lambda env, out: None),
+                 self.assign(count, self.intExpr(self.config.expr_depth, scope))]
+        flag_expr = self.boolExpr(self.config.expr_depth, scope)
+        flag_eval = flag_expr.evaluate
+
+        def setFlag(env, out):
+            env[flag] = flag_eval(env)
+        stats.append(Stat(f"{flag} = {flag_expr.text}", setFlag))
+        stats.append(Stat(f"{var}.label = \"{label}\"", lambda env, out: None))
+        scope.append(count)
+        stats.append(self.println(self.variable(count)))
+        stats.append(self.printlnBool(Expr(flag, 1, lambda env: env[flag])))
+        stats.append(Stat(f"println {var}.label", lambda env, out: out.append(f"{label}\n")))
+        return stats
+
+    def stringLiteral(self) -> str:
+        # '#' and the word 'read' would confuse the test scripts
+        return " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(1, 4))) + f" {self.names}"
+
+    def string(self) -> list:
+        name, literal = self.fresh("s"), self.stringLiteral()
+        return [Stat(f"string {name} = \"{literal}\"", lambda env, out: None),
+                Stat(f"println {name}", lambda env, out: out.append(f"{literal}\n"))]
+
+    def array(self) -> list:
+        name = self.fresh("arr")
+        values = [self.rng.randrange(MAX_LITERAL) for _ in range(self.config.array_size)]
+        index = self.rng.randrange(len(values))
+        return [Stat(f"int[] {name} = [{', '.join(map(str, values))}]", lambda env, out: None),
+                Stat(f"println len {name}", lambda env, out: out.append(f"{len(values)}\n")),
+                Stat(f"println {name}[{index}]", lambda env, out: out.append(f"{values[index]}\n"))]
+
+    def generate(self):
+        ''' Returns the source of the program, its expected output and its exit code '''
+        functions = [self.function(i) for i in range(self.config.functions)]
+        scope = []
+        # the units are shuffled before they are generated, so every variable is declared before it is used
+        units = [self.string for _ in range(self.config.strings)]
+        units += [lambda i=i: self.struct(i, scope) for i in range(self.config.structs)]
+        units += [lambda f=f: [self.call(scope, f)] for f in self.functions]
+        if self.config.array_size > 0:
+            units.append(self.array)
+        self.rng.shuffle(units)
+        units.append(lambda: [self.nestedStat(0, scope, self.functions)])
+
+        main = [stat for unit in units for stat in unit()]
+        exit_expr = self.intExpr(self.config.expr_depth, scope)
+        main.append(Stat(f"exit {exit_expr.text}", None))
+
+        env, out = {}, []
+        for stat in main[:-1]:
+            stat.execute(env, out)
+        # the exit status is the low byte of the value
+        exit_code = exit_expr.evaluate(env) & 0xFF
+
+        output = "".join(out)
+        header = (f"# generated by generator.py (seed {self.config.seed})\n\n"
+                  f"{EXIT_CODE_REGEX}\n# {exit_code}\n\n{EXTENSION_OUTPUT_SPLIT}\n"
+                  + "".join(f"# {line}\n" for line in output.splitlines())
+                  + f"{EXTENSION_OUTPUT_SPLIT}\n\n# Program:\n\n")
+        declarations = "".join(f"{decl}\n" for decl in self.struct_decls + functions)
+        source = f"{header}begin\n{declarations}{joinStats(main, INDENT)}\nend\n"
+        return source, output, exit_code
+
+
+def joinStats(stats: list, indent: str) -> str:
+    return " ;\n".join(indent + stat.text for stat in stats)
+
+def generateProgram(config: GeneratorConfig):
+    ''' Returns (source, expected output, expected exit code) of a program of the given size '''
+    # both the generation and the evaluation recurse once per nesting level
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100 * (config.depth + config.expr_depth) + 1000))
+    return ProgramGenerator(config).generate()
+
+def writeProgram(path: str, config: GeneratorConfig) -> str:
+    source, _, _ = generateProgram(config)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(source)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generates valid WACC programs of a configurable size')
+    parser.add_argument('-o', '--output-dir', default=GENERATED_DIR, help='directory of the generated programs')
+    parser.add_argument('-n', '--count', default=1, type=int, help='number of programs, the seeds are consecutive')
+    parser.add_argument('--seed', default=0, type=int, help='seed of the first program')
+    parser.add_argument('--functions', default=10, type=int, help='number of functions')
+    parser.add_argument('--depth', default=5, type=int, help='nesting depth of the if/while/begin statements')
+    parser.add_argument('--expr-depth', default=2, type=int, help='depth of the expressions')
+    parser.add_argument('--structs', default=2, type=int, help='number of struct declarations')
+    parser.add_argument('--strings', default=10, type=int, help='number of string literals')
+    parser.add_argument('--array-size', default=10, type=int, help='length of the array literal (0 for none)')
+    options = parser.parse_args()
+
+    for seed in range(options.seed, options.seed + options.count):
+        config = GeneratorConfig(options.functions, options.depth, options.expr_depth, options.structs,
+                                 options.strings, options.array_size, seed)
+        print(writeProgram(os.path.join(options.output_dir, f"generated{seed}.wacc"), config))
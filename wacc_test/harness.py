@@ -0,0 +1,117 @@
+'''
+Helpers shared by the wacc_test scripts: talking to refCompile, assembling and
+emulating the compiled code and comparing the outputs.
+
+None of the functions change the working directory, every path is either
+given explicitly or resolved against the wacc_test directory, so they are
+safe to call from parallel workers.
+'''
+import os, re, subprocess
+import difflib as dl
+
+WACC_TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(WACC_TEST_DIR)
+COMPILE_SCRIPT = os.path.join(ROOT_DIR, "compile")
+REFCOMPILE_SCRIPT = os.path.join(WACC_TEST_DIR, "refCompile")
+COMPILED_CODE_DIR = os.path.join(WACC_TEST_DIR, "compiled_code")
+
+REFCOMPILER_OUTPUT = "-x"
+REFCOMPILER_ASSEMBLY = "-a"
+REFCOMPILER_SEMANTIC = "-s"
+REFCOMPILER_SPLIT = "==========================================================="
+EXTENSION_OUTPUT_SPLIT = "# Output:"
+EXIT_CODE_REGEX = "# Exit:"
+REF_EXIT_CODE_REGEX = "Exit code ([0-9]+) returned"
+DEFAULT_INPUT = "default_input"
+
+GCC_FLAGS = ["-mcpu=arm1176jzf-s", "-mtune=arm1176jzf-s"]
+EMULATION_TIMEOUT = "10s"
+
+red="\033[0;31m"
+green="\033[0;32m"
+yellow="\033[0;33m"
+clear="\033[0m"
+
+# intelligently compares two strings displaying - or + where lines are missed or added
+def compareStrings(correct: str, received: str) -> str:
+    correct_list = filter(lambda a: a != "", correct.split("\n"))
+    result_list = filter(lambda a: a != "", received.split("\n"))
+    # replace all tabs with four spaces
+    correct_list = map(lambda line: line.replace("\t", "    "), correct_list)
+    result_list = map(lambda line: line.replace("\t", "    "), result_list)
+    # calculate difference
+    differences = ""
+    for diff in list(dl.unified_diff(list(correct_list), list(result_list)))[3:]:
+        differences += f"{diff}\n"
+    return differences[:-1]
+
+# removes all occurrances of any addresses that will be printed by the compiler.
+# assumes that the user won't be printing an numbers in the same format as the
+# address, i.e. 0x[0-9]+ = .*
+def removeAddressOccurances(consoleOutput: str) -> str:
+    output = re.sub("0x[a-f0-9]+", '', consoleOutput)
+    return re.sub("#addrs#", '', output)
+
+# extracts the expected output from inbetween the ======= in the refCompiler
+# Also extract error code.
+def extractGoodStuffFromRefCompile(refCompileOutput: str):
+    exit_code = re.search(r'The exit code is ([0-9]+).', refCompileOutput).group(1)
+    return refCompileOutput.split(REFCOMPILER_SPLIT)[1], exit_code
+
+# extracts the exit code reported by 'refCompile -s', 0 if there is none
+def extractExitCodeFromRefSemanticCheck(refCompileOutput: str) -> int:
+    match = re.search(REF_EXIT_CODE_REGEX, refCompileOutput)
+    return int(match.group(1)) if match else 0
+
+def getExitCodeFromWaccSource(wacc_sourceCode: str) -> int:
+    if EXIT_CODE_REGEX not in wacc_sourceCode:
+        return 0
+    else:
+        return int(re.search(rf'{EXIT_CODE_REGEX}\n# ((-|\+)?[0-9]+)', wacc_sourceCode).group(1))
+
+# returns the expected (output, exit code) of an extension file or None if it does not specify the output
+def extractGoodStuffFromWaccSource(wacc_sourceCode: str):
+    match = re.search(rf'{EXTENSION_OUTPUT_SPLIT}((.*\n)*){EXTENSION_OUTPUT_SPLIT}', wacc_sourceCode)
+    if match is None:
+        return None
+
+    exit_code = getExitCodeFromWaccSource(wacc_sourceCode)
+    output = match.group(1)
+    # trim comments from predicted output
+    # assume that the form of output is always ('# (content)\n')*
+    output = re.sub( "# ", '', output)
+    output = removeAddressOccurances(output)
+
+    return output, exit_code
+
+# path of the directory in wacc_test/compiled_code which mirrors the directory of the wacc file,
+# the path of the wacc file is relative to wacc_test
+def getCompiledDir(path: str) -> str:
+    return os.path.join(COMPILED_CODE_DIR, os.path.dirname(path))
+
+def getTestName(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+# calls the reference compiler over the network, the path is relative to wacc_test
+def runRefCompile(path: str, mode: str, stdin: str = "") -> str:
+    proc = subprocess.run([REFCOMPILE_SCRIPT, mode, path], input=f"{stdin}\n", cwd=WACC_TEST_DIR,
+                          capture_output=True, text=True)
+    return proc.stdout
+
+def assemble(assembly_path: str, binary_path: str) -> int:
+    proc = subprocess.run(["arm-linux-gnueabi-gcc", "-o", binary_path] + GCC_FLAGS + [assembly_path],
+                          capture_output=True, text=True)
+    return proc.returncode
+
+# runs the binary under qemu, returns the output and the exit code
+def emulate(binary_path: str, stdin: str = ""):
+    try:
+        sp = subprocess.run(["timeout", EMULATION_TIMEOUT, "qemu-arm", "-L", "/usr/arm-linux-gnueabi/", binary_path],
+                            input=stdin, capture_output=True, text=True)
+        return str(sp.stdout), sp.returncode
+    except UnicodeDecodeError:
+        print(f"WARNING: The file {binary_path} could not be decoded (utf-8?)")
+        return "", -1
+
+def formatEmulatedOutput(output: str, exit_code) -> str:
+    return output + f"\nExit code returned: {exit_code}\n"
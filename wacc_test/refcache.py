@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+'''
+Content addressed cache of the reference compiler outputs.
+
+The outputs are stored in a single SQLite database keyed by the hash of the
+wacc source, the stdin given to the program and the refCompile mode, so a
+renamed or moved program still hits the cache and an edited one never does.
+Every write is a single transaction, which makes the cache safe to share
+between the parallel test workers.
+
+Can also be used from the shell scripts:
+    ./refcache.py [--offline] -s sample_programs/valid/basic/skip/skip.wacc
+'''
+import os, sys, argparse, hashlib, sqlite3, time
+
+from harness import WACC_TEST_DIR, REFCOMPILER_OUTPUT, REFCOMPILER_ASSEMBLY, REFCOMPILER_SEMANTIC, \
+    getTestName, runRefCompile
+
+REF_CACHE_DB = os.path.join(WACC_TEST_DIR, "reference_cache.sqlite3")
+LEGACY_CACHE_DIR = "reference_cache"
+SAMPLE_PROGRAMS_DIR = "sample_programs"
+# refCompile prints this header only if the request reached the server
+COMPLETE_OUTPUT_MARK = "-- Compiler Output:"
+DB_TIMEOUT = 60  # seconds
+
+
+class RefCacheMiss(Exception):
+    ''' Raised in offline mode instead of calling refCompile '''
+
+    def __init__(self, path, mode):
+        super().__init__(f"reference output of {path} ({mode}) is not cached and the cache is offline")
+
+
+def cacheKey(source: str, mode: str, stdin: str) -> str:
+    digest = hashlib.sha256()
+    for part in (source, stdin, mode):
+        digest.update(part.encode('utf-8'))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class RefCache:
+
+    def __init__(self, db_path: str = REF_CACHE_DB, offline: bool = False):
+        self.offline = offline
+        self.connection = sqlite3.connect(db_path, timeout=DB_TIMEOUT)
+        # write ahead log lets the readers carry on while another worker writes
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS refs ("
+                                    "key TEXT PRIMARY KEY, mode TEXT, output TEXT, created REAL)")
+
+    def get(self, source: str, mode: str, stdin: str = ""):
+        row = self.connection.execute("SELECT output FROM refs WHERE key = ?",
+                                      (cacheKey(source, mode, stdin),)).fetchone()
+        return row[0] if row else None
+
+    def put(self, source: str, mode: str, stdin: str, output: str):
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO refs VALUES (?, ?, ?, ?)",
+                                    (cacheKey(source, mode, stdin), mode, output, time.time()))
+
+    def refCompile(self, path: str, mode: str, stdin: str = "") -> str:
+        ''' Output of 'refCompile <mode> <path>', the path is relative to wacc_test '''
+        with open(os.path.join(WACC_TEST_DIR, path), 'r') as f:
+            source = f.read()
+
+        output = self.get(source, mode, stdin)
+        if output is not None:
+            return output
+
+        output = readLegacyCache(path, source) if mode == REFCOMPILER_SEMANTIC else None
+        if output is None:
+            if self.offline:
+                raise RefCacheMiss(path, mode)
+            output = runRefCompile(path, mode, stdin)
+        # network failures must not be cached
+        if COMPLETE_OUTPUT_MARK in output:
+            self.put(source, mode, stdin, output)
+        return output
+
+    def close(self):
+        self.connection.close()
+
+
+# reference_cache/<dir>/<name>.ref files used by testOne.sh before the database existed
+def readLegacyCache(path: str, source: str):
+    cached = os.path.join(WACC_TEST_DIR, os.path.dirname(path).replace(SAMPLE_PROGRAMS_DIR, LEGACY_CACHE_DIR, 1),
+                          getTestName(path) + ".ref")
+    if not os.path.isfile(cached):
+        return None
+    with open(cached, 'r') as f:
+        content = f.read()
+    # Make sure file contains actual wacc source code (ie. wacc has not been modified)
+    return content if source in content else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Prints the (cached) output of the reference compiler')
+    parser.add_argument('src_file', help='wacc file relative to wacc_test')
+    modes = parser.add_mutually_exclusive_group(required=True)
+    for flag in (REFCOMPILER_SEMANTIC, REFCOMPILER_OUTPUT, REFCOMPILER_ASSEMBLY):
+        modes.add_argument(flag, dest='mode', action='store_const', const=flag)
+    parser.add_argument('-p', default="", type=str, help='input into the program')
+    parser.add_argument('--offline', action="store_true", help='fail instead of calling refCompile on a cache miss')
+    options = parser.parse_args()
+
+    try:
+        print(RefCache(offline=options.offline).refCompile(options.src_file, options.mode, options.p))
+    except RefCacheMiss as e:
+        print(f"Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,134 @@
+'''
+History of the test runs of testParallel, kept in an SQLite database.
+
+Every run is keyed by the git commit it tested (and whether the tree had
+uncommitted changes), every program checked in the run gets a row with its
+verdict, the time spent in every phase, the exit codes and the size of the
+emulated output. testReport reads the database to show the slowest tests,
+the phases which got slower between two commits and to export JUnit XML.
+'''
+import os, sqlite3, statistics, subprocess
+
+from harness import WACC_TEST_DIR, ROOT_DIR
+
+RESULTS_DB = os.path.join(WACC_TEST_DIR, "test_results.sqlite3")
+DB_TIMEOUT = 60  # seconds
+PHASES = ["compile", "assemble", "emulate", "reference"]
+
+
+class UnknownCommit(Exception):
+    def __init__(self, revision):
+        super().__init__(f"no recorded runs of the commit '{revision}'")
+
+
+# returns the hash of HEAD and whether the tree has uncommitted changes
+def getCommit():
+    head = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True)
+    status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT_DIR,
+                            capture_output=True, text=True)
+    return head.stdout.strip(), bool(status.stdout.strip())
+
+
+class ResultsDB:
+
+    def __init__(self, db_path: str = RESULTS_DB):
+        self.connection = sqlite3.connect(db_path, timeout=DB_TIMEOUT)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS runs ("
+                                    "id INTEGER PRIMARY KEY, commit_hash TEXT, dirty INTEGER, mode TEXT, "
+                                    "started REAL, wall_time REAL)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS results ("
+                                    "run INTEGER REFERENCES runs(id), path TEXT, verdict TEXT, message TEXT, "
+                                    + "".join(f"{phase}_time REAL, " for phase in PHASES) +
+                                    "compile_exit_code INTEGER, exit_code INTEGER, output_size INTEGER, "
+                                    "emulation_skipped INTEGER, PRIMARY KEY (run, path))")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS runs_by_commit ON runs (commit_hash, mode)")
+
+    def addRun(self, commit: str, dirty: bool, mode: str, started: float, wall_time: float, results: list) -> int:
+        ''' Records the TestResults of a whole run in one transaction, returns the id of the run '''
+        with self.connection:
+            run = self.connection.execute("INSERT INTO runs (commit_hash, dirty, mode, started, wall_time) "
+                                          "VALUES (?, ?, ?, ?, ?)",
+                                          (commit, dirty, mode, started, wall_time)).lastrowid
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO results VALUES ({', '.join('?' * (len(PHASES) + 8))})",
+                [(run, r.path, r.verdict, r.message) + tuple(r.timings.get(phase) for phase in PHASES) +
+                 (r.compile_exit_code, r.exit_code, r.output_size, r.emulation_skipped) for r in results])
+        return run
+
+    def resolveCommit(self, revision: str) -> str:
+        ''' Returns the recorded commit named by a git revision (HEAD~2, a branch) or a prefix of its hash '''
+        proc = subprocess.run(["git", "rev-parse", "--verify", "--quiet", f"{revision}^{{commit}}"], cwd=ROOT_DIR,
+                              capture_output=True, text=True)
+        prefix = proc.stdout.strip() or revision
+        row = self.connection.execute("SELECT commit_hash FROM runs WHERE commit_hash LIKE ? "
+                                      "ORDER BY started DESC LIMIT 1", (prefix + "%",)).fetchone()
+        if row is None:
+            raise UnknownCommit(revision)
+        return row[0]
+
+    def runs(self, limit: int = None):
+        ''' Returns (id, commit, dirty, mode, started, wall time, tests, failed) of the runs, the newest first '''
+        return self.connection.execute(
+            "SELECT runs.id, commit_hash, dirty, mode, started, wall_time, COUNT(path), "
+            "SUM(verdict = 'FAIL') FROM runs LEFT JOIN results ON results.run = runs.id "
+            "GROUP BY runs.id ORDER BY started DESC LIMIT ?", (-1 if limit is None else limit,)).fetchall()
+
+    def latestRun(self, commit: str = None, mode: str = None):
+        ''' Returns the id of the last run, of the commit and the mode if they are given, or None '''
+        row = self.connection.execute("SELECT id FROM runs WHERE (?1 IS NULL OR commit_hash = ?1) "
+                                      "AND (?2 IS NULL OR mode = ?2) ORDER BY started DESC LIMIT 1",
+                                      (commit, mode)).fetchone()
+        return row[0] if row else None
+
+    def results(self, run: int) -> list:
+        ''' Returns the rows of the run as dictionaries keyed by the column names '''
+        cursor = self.connection.execute("SELECT * FROM results WHERE run = ? ORDER BY path", (run,))
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def slowest(self, run: int, phase: str = None, limit: int = 10) -> list:
+        ''' Returns the rows of the run which took the longest in the phase, in all of them if it is None '''
+        def duration(row):
+            if phase is not None:
+                return row[f"{phase}_time"] or 0
+            return sum(row[f"{p}_time"] or 0 for p in PHASES)
+        return sorted(self.results(run), key=duration, reverse=True)[:limit]
+
+    def countRuns(self, commit: str, mode: str, dirty: bool) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM runs WHERE commit_hash = ? AND mode = ? AND dirty = ?",
+                                       (commit, mode, dirty)).fetchone()[0]
+
+    def phaseTimes(self, commit: str, mode: str, include_dirty: bool = False) -> dict:
+        ''' Returns {path: {phase: median seconds}} over the runs of the commit in the mode,
+            the runs with uncommitted changes only if include_dirty is set '''
+        samples = {}
+        rows = self.connection.execute("SELECT path, " + ", ".join(f"{phase}_time" for phase in PHASES) +
+                                       " FROM results JOIN runs ON results.run = runs.id "
+                                       "WHERE commit_hash = ? AND mode = ? AND (? OR NOT dirty)",
+                                       (commit, mode, include_dirty))
+        for path, *times in rows:
+            by_phase = samples.setdefault(path, {})
+            for phase, seconds in zip(PHASES, times):
+                # phases skipped in a run (e.g. a reused verdict) do not count
+                if seconds is not None:
+                    by_phase.setdefault(phase, []).append(seconds)
+        return {path: {phase: statistics.median(times) for phase, times in by_phase.items()}
+                for path, by_phase in samples.items()}
+
+    def compare(self, old_commit: str, new_commit: str, mode: str, threshold: float, min_seconds: float,
+                include_dirty: bool = False) -> list:
+        ''' Returns (path, phase, old seconds, new seconds) of every phase which got slower than the threshold
+            in percent and by at least min_seconds, the largest slowdowns first '''
+        old_times = self.phaseTimes(old_commit, mode, include_dirty)
+        regressions = []
+        for path, times in self.phaseTimes(new_commit, mode, include_dirty).items():
+            for phase, new in times.items():
+                old = old_times.get(path, {}).get(phase)
+                if old is not None and new - old >= min_seconds and new > old * (1 + threshold / 100):
+                    regressions.append((path, phase, old, new))
+        return sorted(regressions, key=lambda regression: regression[2] - regression[3])
+
+    def close(self):
+        self.connection.close()
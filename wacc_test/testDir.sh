@@ -1,27 +1,5 @@
 #!/usr/bin/env bash
 
-shopt -s globstar
-
-failed=0
-processed=0
-
-for f in $1
-do
-    ./testOne.sh "$f"
-
-    if [[ $? != 0 ]]
-    then
-        ((failed++))
-    fi
-
-    ((processed++))
-done
-
-echo "Failed $failed out of $processed tests."
-
-if [[ failed -eq 0 ]]
-then
-    exit 0
-else
-    exit 1
-fi
\ No newline at end of file
+# Checks the exit codes of all the files matching the glob pattern concurrently,
+# see ./testParallel -h for the options. ./testOne.sh still checks a single file.
+./testParallel -s "$1"
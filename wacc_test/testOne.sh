@@ -9,25 +9,15 @@ cd wacc_test
 # Workaround to rename root folder "example_wacc" to "results"
 oldDir=$(dirname $1)
 dir=${oldDir/sample_programs/results}
-dircache=${oldDir/sample_programs/reference_cache}
 name=$(basename $1 .wacc)
 
-a=`cat $1`
-
-# Check if the output of this file has been pre-cached.
-if test -f "$dircache/$name.ref"
+# Reference output comes from the shared reference cache, refCompile is only called on a miss.
+# Set REFCACHE_OFFLINE=1 to fail instead of calling refCompile.
+expectedStd=$(./refcache.py -s ${REFCACHE_OFFLINE:+--offline} $1)
+if [[ $? != 0 ]]
 then
-  b=`cat "$dircache/$name.ref"`
-  # Make sure file contains actual wacc source code (ie. wacc has not been modified)
-  if [[ "$b" == *"$a"* ]]
-  then
-    expectedStd=$b
-  else
-    expectedStd=$(./refCompile -s $1)
-  fi
-else
-  # Run reference compiler if not
-  expectedStd=$(./refCompile -s $1)
+    echo -e "\033[0;31mFAIL $1\033[0m - $expectedStd"
+    exit 1
 fi
 expectedErr="0"
 
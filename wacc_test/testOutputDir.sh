@@ -1,27 +1,5 @@
 #!/usr/bin/env bash
 
-shopt -s globstar
-
-failed=0
-processed=0
-
-for f in $2
-do
-    ./testOutputOne "$1" "$f"
-
-    if [[ $? != 0 ]]
-    then
-        ((failed++))
-    fi
-
-    ((processed++))
-done
-
-echo "Failed $failed out of $processed tests."
-
-if [[ failed -eq 0 ]]
-then
-    exit 0
-else
-    exit 1
-fi
\ No newline at end of file
+# Checks the outputs of all the files matching the glob pattern concurrently,
+# see ./testParallel -h for the options. ./testOutputOne still checks a single file.
+./testParallel "$1" "$2"
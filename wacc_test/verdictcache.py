@@ -0,0 +1,48 @@
+'''
+Last verdict of every program checked by emulation, together with the fingerprint
+of everything the verdict depends on: the generated assembly, the wacc source
+(which holds the '# Output:' header), the test mode and the stdin.
+
+When a fresh compilation yields the same fingerprint, testParallel reuses the
+verdict instead of assembling and emulating the program again.
+'''
+import os, hashlib, sqlite3, time
+
+from harness import WACC_TEST_DIR
+
+VERDICT_CACHE_DB = os.path.join(WACC_TEST_DIR, "verdict_cache.sqlite3")
+DB_TIMEOUT = 60  # seconds
+
+
+def fingerprint(assembly: str, source: str, mode: str, stdin: str) -> str:
+    digest = hashlib.sha256()
+    for part in (assembly, source, mode, stdin):
+        digest.update(part.encode('utf-8'))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class VerdictCache:
+
+    def __init__(self, db_path: str = VERDICT_CACHE_DB):
+        self.connection = sqlite3.connect(db_path, timeout=DB_TIMEOUT)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS verdicts ("
+                                    "path TEXT, mode TEXT, fingerprint TEXT, verdict TEXT, message TEXT, "
+                                    "created REAL, PRIMARY KEY (path, mode))")
+
+    def get(self, path: str, mode: str, fingerprint: str):
+        ''' Returns (verdict, message) recorded for the same fingerprint or None '''
+        row = self.connection.execute("SELECT verdict, message FROM verdicts "
+                                      "WHERE path = ? AND mode = ? AND fingerprint = ?",
+                                      (path, mode, fingerprint)).fetchone()
+        return tuple(row) if row else None
+
+    def put(self, path: str, mode: str, fingerprint: str, verdict: str, message: str):
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?)",
+                                    (path, mode, fingerprint, verdict, message, time.time()))
+
+    def close(self):
+        self.connection.close()